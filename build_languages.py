@@ -0,0 +1,166 @@
+""" Build the HTML documentation in English and in several other languages, reusing the English
+build for the documents that are not translated.
+
+The English documentation is built first. The build of each other language then starts from a copy
+of the English doctrees and pickled environment, in which only the documents that have a message
+catalog in that language are read again to be translated; the others, e.g., the "Developer"
+documentation, are written as they were read in English. The builds of the other languages run in
+parallel, in a pool of processes.
+
+Usage: python build_languages.py --languages=en,fr,de SOURCE_DIR OUTPUT_DIR [SPHINX_BUILD_OPTIONS]
+
+The English documentation is built in OUTPUT_DIR, and the documentation of each other language in
+OUTPUT_DIR/<language>, with the log of its build in OUTPUT_DIR/<language>/.doctrees/build.log.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_LANGUAGE = 'en'
+DOCTREES_DIR = '.doctrees'
+BUILD_LOG_FILE = 'build.log'
+# The config values of the environment that differ between the English build and that of another
+# language. Other changes, e.g., of the options of an extension, still make all documents be read.
+LANGUAGE_CONFIG_VALUES = {'language', 'locale_dirs', 'numfig_format'}
+
+
+def get_translated_docs(app, env, added, changed, removed):
+    """ Return the documents that have a message catalog in the language of the build, so that
+    they are read again and translated.
+
+    Meant to be connected to the `env-get-outdated` event.
+    """
+    from sphinx.util import i18n  # Looked up at call time, as conf.py patches docname_to_domain.
+
+    catalogs = i18n.CatalogRepository(
+        app.srcdir, app.config.locale_dirs, app.config.language, app.config.source_encoding
+    ).catalogs
+    domains = {catalog.domain for catalog in catalogs}
+    return [
+        docname for docname in env.found_docs
+        if i18n.docname_to_domain(docname, app.config.gettext_compact) in domains
+    ]
+
+
+def build_translation(sphinx_argv):
+    """ Run sphinx-build, reading again only the documents returned by `get_translated_docs`. """
+    import sphinx.cmd.build
+    from sphinx.application import Sphinx
+    from sphinx.environment import CONFIG_CHANGED, CONFIG_OK, BuildEnvironment
+
+    update_config = BuildEnvironment._update_config
+
+    def update_translation_config(env, config):
+        """ Update the config of the environment of the English build, ignoring the changes of the
+        values that depend on the language: the documents they affect are read again anyway.
+        """
+        previous_config = env.config
+        update_config(env, config)
+        if env.config_status == CONFIG_CHANGED:
+            changed_names = [
+                item.name for item in config.filter('env')
+                if item.name not in LANGUAGE_CONFIG_VALUES
+                and previous_config[item.name] != item.value
+            ]
+            env.config_status = CONFIG_CHANGED if changed_names else CONFIG_OK
+            env.config_status_extra = f' ({changed_names[0]!r})' if changed_names else ''
+
+    class TranslationSphinx(Sphinx):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.connect('env-get-outdated', get_translated_docs)
+
+    BuildEnvironment._update_config = update_translation_config
+    sphinx.cmd.build.Sphinx = TranslationSphinx
+    return sphinx.cmd.build.build_main(sphinx_argv)
+
+
+def reuse_base_build(base_outdir, outdir):
+    """ Copy the doctrees and the pickled environment of the English build to the output directory
+    of a language.
+    """
+    doctreedir = Path(outdir, DOCTREES_DIR)
+    shutil.copytree(Path(base_outdir, DOCTREES_DIR), doctreedir, dirs_exist_ok=True)
+    return doctreedir
+
+
+def build_language(language, args):
+    """ Build the documentation of a language from the English build, in a separate process.
+
+    :return: The exit status of the build and its duration, in seconds.
+    """
+    start = time.perf_counter()
+    outdir = Path(args.outdir, language)
+    doctreedir = reuse_base_build(args.outdir, outdir)
+    with Path(doctreedir, BUILD_LOG_FILE).open('w') as log:
+        status = subprocess.run(
+            [
+                sys.executable, __file__, '--translate', *args.sphinx_options,
+                '-D', f'language={language}', '-d', str(doctreedir), args.sourcedir, str(outdir),
+            ],
+            stdout=log, stderr=subprocess.STDOUT,
+        ).returncode
+    return status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the documentation in several languages, reusing the English build."
+    )
+    parser.add_argument(
+        '--languages', default=BASE_LANGUAGE,
+        help="Comma-separated list of the languages to build (English is always built).",
+    )
+    parser.add_argument(
+        '--processes', type=int, default=os.cpu_count(),
+        help="Number of languages built in parallel after English (default: number of CPUs).",
+    )
+    parser.add_argument('sourcedir')
+    parser.add_argument('outdir')
+    parser.add_argument(
+        'sphinx_options', nargs=argparse.REMAINDER,
+        help="Options passed to sphinx-build, e.g., -c . -b html -D versions=18.0,19.0",
+    )
+    args = parser.parse_args()
+
+    languages = [
+        language for language in args.languages.split(',') if language not in ('', BASE_LANGUAGE)
+    ]
+    print(f"Building the documentation in {BASE_LANGUAGE}...")
+    base_doctreedir = Path(args.outdir, DOCTREES_DIR)
+    status = subprocess.run([
+        sys.executable, '-m', 'sphinx', *args.sphinx_options, '-D', f'language={BASE_LANGUAGE}',
+        '-d', str(base_doctreedir), args.sourcedir, args.outdir,
+    ]).returncode
+    if status:
+        sys.exit(status)
+
+    print(f"Building the documentation in {', '.join(languages)}...")
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.processes) as executor:
+        futures = {
+            language: executor.submit(build_language, language, args) for language in languages
+        }
+        for language, future in futures.items():
+            status, duration = future.result()
+            log_file = Path(args.outdir, language, DOCTREES_DIR, BUILD_LOG_FILE)
+            if status:
+                failed.append(language)
+                print(f"{language}: failed after {duration:.0f}s, see {log_file}")
+            else:
+                print(f"{language}: built in {duration:.0f}s, see {log_file}")
+    if failed:
+        sys.exit(f"The build failed for: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--translate']:
+        sys.exit(build_translation(sys.argv[2:]))
+    main()
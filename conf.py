@@ -1,3 +1,4 @@
+import functools
 import os
 import re
 import shutil
@@ -181,6 +182,15 @@ extensions = [
     # Redirection generator
     'redirects',
 
+    # Cache of the compiled message catalogs of translated builds
+    'catalog_cache',
+
+    # Timings of the build, enabled with the `build_profile_dir` config value
+    'build_profiler',
+
+    # Precompressed copies of the output, enabled with the `precompress_output` config value
+    'precompress',
+
     # Content tabs
     'sphinx_tabs.tabs',
 
@@ -370,6 +380,17 @@ latex_logo = 'static/img/odoo_logo.png'
 # If true, show URL addresses after external links.
 latex_show_urls = 'True'
 
+def compile_source_read_replace(app):
+    """Compile the names of `source_read_replace_vals` into a single regex matching any of them
+    surrounded by curly braces, so that `source_read_replace` substitutes them in a single pass.
+
+    Meant to be connected to the `builder-inited` event.
+    """
+    vals = app.config.source_read_replace_vals
+    app.source_read_replace_re = vals and re.compile(
+        r'\{(' + '|'.join(re.escape(key) for key in vals) + r')\}'
+    )
+
 # https://github.com/sphinx-doc/sphinx/issues/4054#issuecomment-329097229
 def source_read_replace(app, docname, source):
     """Substitute parts of strings with computed values.
@@ -381,10 +402,11 @@ def source_read_replace(app, docname, source):
 
     Meant to be connected to the `source-read` event.
     """
-    result = source[0]
-    for key in app.config.source_read_replace_vals:
-        result = result.replace(f"{{{key}}}", app.config.source_read_replace_vals[key])
-    source[0] = result
+    pattern = app.source_read_replace_re
+    if not pattern or '{' not in source[0]:  # No placeholder to substitute.
+        return
+    vals = app.config.source_read_replace_vals
+    source[0] = pattern.sub(lambda match: vals[match.group(1)], source[0])
 
 def upgrade_util_signature_rewrite(app, domain, objtype, contentnode):
     # Same as add_module_names=False but **only** for odoo.upgrade.util functions or classes
@@ -406,6 +428,7 @@ def setup(app):
     app.add_config_value('languages', None, 'env')
     app.add_config_value('is_remote_build', None, 'env')  # Whether the build is remotely deployed
     app.add_config_value('source_read_replace_vals', {}, 'env')
+    app.connect('builder-inited', compile_source_read_replace)
     app.connect('source-read', source_read_replace)
     app.connect('object-description-transform', upgrade_util_signature_rewrite)
     # TODO uncomment after moving to >= v7.2.5 to also substitute placeholders in included  files.
@@ -415,6 +438,7 @@ def setup(app):
     app.add_lexer('json', JsonLexer)
     app.add_lexer('xml', XmlLexer)
 
+    app.connect('builder-inited', prepare_alternate_urls)
     app.connect('html-page-context', _generate_alternate_urls)
 
     # Add a `condition` option on directives to ignore them based on config values
@@ -438,6 +462,85 @@ def setup(app):
         patch(to_patch)
 
 
+def prepare_alternate_urls(app):
+    """ Precompute the parts of the alternate URLs that are shared by all documents of the build.
+
+    The alternate URLs of a document only differ by their page, so that `_generate_alternate_urls`
+    merely appends the page of each document to the roots computed here.
+
+    Meant to be connected to the `builder-inited` event.
+    """
+    config = app.config
+    if config.is_remote_build:
+        # Project root like https://www.odoo.com/documentation
+        root_ = config.project_root
+    else:
+        # Project root like .../documentation/_build/html/14.0/fr
+        root_ = re.sub(rf'(/{config.version})?(/{config.language})?$', '', app.outdir)
+
+    def build_root(version_, lang_):
+        return f'{root_}' \
+               f'{f"/{version_}" if config.versions else ""}' \
+               f'{f"/{lang_}" if lang_ != "en" else ""}' \
+               f'/'
+
+    # If the canonical version is not set, assume that the project has a single version
+    canonical_version_ = config.canonical_version or config.version
+    current_lang_ = config.language or 'en'
+    # If the lists of versions and languages are not set, assume that the project has no
+    # alternate version or language.
+    provided_versions_ = config.versions and config.versions.split(',') or []
+    provided_languages_ = config.languages and config.languages.split(',') or []
+    app.alternate_urls = {
+        'current_lang': current_lang_,
+        # The canonical language is always 'en'. Don't take the value of the config option.
+        'canonical_root': build_root(canonical_version_, 'en'),
+        'version_display_name': versions_names.get(version, version),
+        # The (display name, root) of the alternate versions, latest first.
+        'versions': [
+            (versions_names.get(alternate_version_, alternate_version_),
+             build_root(alternate_version_, current_lang_))
+            for alternate_version_ in reversed(provided_versions_)
+            if alternate_version_ != version
+        ],
+        # The (display name, code, lang, root) of the alternate languages.
+        'languages': [
+            (
+                languages_names.get(alternate_lang_, alternate_lang_.upper()),
+                alternate_lang_.split('_')[0] if alternate_lang_ != 'en' else 'x-default',
+                alternate_lang_,
+                build_root(config.version, alternate_lang_),
+            )
+            for alternate_lang_ in provided_languages_
+            if alternate_lang_ != current_lang_
+        ],
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _get_alternate_page(pagename, lang_, is_remote_build):
+    """ Return the path of a page, relative to the root of the documentation in a given language.
+
+    Legal translations have different URLs schemes as they are not managed on transifex.
+    E.g., FR translation of /terms/enterprise => /fr/terms/enterprise_fr
+    """
+    page_ = pagename
+    if pagename.startswith('legal/terms/'):
+        if lang_ in legal_translations and not pagename.endswith(f"_{lang_}"):
+            # remove language code for current translation, set target one
+            page_ = re.sub("_[a-z]{2}$", "", pagename)
+            if 'terms/i18n' not in page_:
+                page_ = page_.replace("/terms/", "/terms/i18n/")
+            page_ = f'{page_}_{lang_}'
+        elif lang_ == 'en' and pagename.endswith(tuple(f"_{l}" for l in legal_translations)):
+            # remove language code for current translation, link to original EN one
+            page_ = re.sub("_[a-z]{2}$", "", pagename).replace("/i18n/", "/")
+    page_ = f'{page_}.html'
+    if is_remote_build:
+        page_ = page_.replace('index.html', '')
+    return page_
+
+
 def _generate_alternate_urls(app, pagename, templatename, context, doctree):
     """ Add keys of required alternate URLs for the current document in the rendering context.
 
@@ -445,107 +548,47 @@ def _generate_alternate_urls(app, pagename, templatename, context, doctree):
       - The canonical link tag
       - The version switcher
       - The language switcher and related link tags
-    """
 
-    def canonicalize():
-        """ Add the canonical URL for the current document in the rendering context.
-
-        The canonical version is the last released version of the documentation.
-        For a given language, the canonical root of a page is in the same language so that web
-        searches in that language don't redirect users to the english version of that page.
-
-        E.g.:
-        - /documentation/sale.html -> canonical = /documentation/14.0/sale.html
-        - /documentation/11.0/fr/website.html -> canonical = /documentation/14.0/fr/website.html
-        """
-        # If the canonical version is not set, assume that the project has a single version
-        canonical_version_ = app.config.canonical_version or app.config.version
-        canonical_lang_ = 'en'  # Always 'en'. Don't take the value of the config option.
-        context['canonical'] = build_url(version_=canonical_version_, lang_=canonical_lang_)
-
-    def versionize():
-        """ Add the pairs of (version, url) for the current document in the rendering context.
-
-        The entry 'version' is added by Sphinx in the rendering context.
-        """
-        context['version_display_name'] = versions_names.get(version, version)
-
-        # If the list of versions is not set, assume the project has no alternate version.
-        provided_versions_ = app.config.versions and app.config.versions.split(',') or []
-
-        # Map alternate versions to their display names and URLs.
-        context['alternate_versions'] = []
-        for alternate_version_ in reversed(provided_versions_):  # Reverse to show latest first.
-            if alternate_version_ != version:
-                display_name_ = versions_names.get(alternate_version_, alternate_version_)
-                context['alternate_versions'].append((display_name_, build_url(alternate_version_)))
-
-    def localize():
-        """ Add the pairs of (lang, code, url) for the current document in the rendering context.
-
-        E.g.: ('French', 'fr', 'https://.../fr_BE/...')
-
-        The entry 'language' is added by Sphinx in the rendering context.
-        """
-        current_lang_ = app.config.language or 'en'
-        # Replace the context value by its upper-cased value ("FR" instead of "fr")
-        context['language'] = languages_names.get(current_lang_, current_lang_.upper())
-        context['language_code'] = current_lang_
-
-        # If the list of languages is not set, assume that the project has no alternate language
-        provided_languages_ = app.config.languages and app.config.languages.split(',') or []
-
-        # Map alternate languages to their display names and URLs.
-        context['alternate_languages'] = []
-        for alternate_lang_ in provided_languages_:
-            if alternate_lang_ != current_lang_:
-                display_name_ = languages_names.get(alternate_lang_, alternate_lang_.upper())
-                context['alternate_languages'].append(
-                    (
-                        display_name_,
-                        alternate_lang_.split('_')[0] if alternate_lang_ != 'en' else 'x-default',
-                        build_url(lang_=alternate_lang_),
-                    )
-                )
-
-        # Dynamic generation of localized legal doc links
-        context['legal_translations'] = legal_translations
-
-    def build_url(version_=None, lang_=None):
-        if app.config.is_remote_build:
-            # Project root like https://www.odoo.com/documentation
-            root_ = app.config.project_root
-        else:
-            # Project root like .../documentation/_build/html/14.0/fr
-            root_ = re.sub(rf'(/{app.config.version})?(/{app.config.language})?$', '', app.outdir)
-        # If the canonical version is not set, assume that the project has a single version
-        canonical_version_ = app.config.canonical_version or app.config.version
-        version_ = version_ or app.config.version
-        lang_ = lang_ or app.config.language or 'en'
-        canonical_page_ = f'{pagename}.html'
-
-        # legal translations have different URLs schemes as they are not managed on transifex
-        # e.g. FR translation of /terms/enterprise => /fr/terms/enterprise_fr
-        if pagename.startswith('legal/terms/'):
-            if lang_ in legal_translations and not pagename.endswith(f"_{lang_}"):
-                # remove language code for current translation, set target one
-                page_ = re.sub("_[a-z]{2}$", "", pagename)
-                if 'terms/i18n' not in page_:
-                    page_ = page_.replace("/terms/", "/terms/i18n/")
-                canonical_page_ = f'{page_}_{lang_}.html'
-            elif lang_ == 'en' and pagename.endswith(tuple(f"_{l}" for l in legal_translations)):
-                # remove language code for current translation, link to original EN one
-                page_ = re.sub("_[a-z]{2}$", "", pagename)
-                canonical_page_ = f'{page_.replace("/i18n/", "/")}.html'
-
-        if app.config.is_remote_build:
-            canonical_page_ = canonical_page_.replace('index.html', '')
+    The roots of the URLs are computed once per build by `prepare_alternate_urls`.
+    """
+    alternate_urls = app.alternate_urls
+    is_remote_build = bool(app.config.is_remote_build)
+    if pagename.startswith('legal/terms/'):
+        def get_page(lang_):
+            return _get_alternate_page(pagename, lang_, is_remote_build)
+    else:  # The page is the same in all languages.
+        page_ = _get_alternate_page(pagename, None, is_remote_build)
+        def get_page(lang_):
+            return page_
+
+    # The canonical version is the last released version of the documentation.
+    # For a given language, the canonical root of a page is in the same language so that web
+    # searches in that language don't redirect users to the english version of that page.
+    #
+    # E.g.:
+    # - /documentation/sale.html -> canonical = /documentation/14.0/sale.html
+    # - /documentation/11.0/fr/website.html -> canonical = /documentation/14.0/fr/website.html
+    context['canonical'] = alternate_urls['canonical_root'] + get_page('en')
+
+    # Add the pairs of (version, url) for the current document in the rendering context.
+    # The entry 'version' is added by Sphinx in the rendering context.
+    context['version_display_name'] = alternate_urls['version_display_name']
+    current_page_ = get_page(alternate_urls['current_lang'])
+    context['alternate_versions'] = [
+        (display_name_, root_ + current_page_)
+        for display_name_, root_ in alternate_urls['versions']
+    ]
 
-        return f'{root_}' \
-               f'{f"/{version_}" if app.config.versions else ""}' \
-               f'{f"/{lang_}" if lang_ != "en" else ""}' \
-               f'/{canonical_page_}'
+    # Add the triplets of (lang, code, url) for the current document in the rendering context,
+    # e.g., ('French', 'fr', 'https://.../fr_BE/...').
+    # Replace the context value 'language' by its display name ("FR" instead of "fr")
+    current_lang_ = alternate_urls['current_lang']
+    context['language'] = languages_names.get(current_lang_, current_lang_.upper())
+    context['language_code'] = current_lang_
+    context['alternate_languages'] = [
+        (display_name_, code_, root_ + get_page(lang_))
+        for display_name_, code_, lang_, root_ in alternate_urls['languages']
+    ]
 
-    canonicalize()
-    versionize()
-    localize()
+    # Dynamic generation of localized legal doc links
+    context['legal_translations'] = legal_translations
@@ -0,0 +1,251 @@
+""" Profile the build: time its phases, the reading, resolving and writing of each document, the
+resolving of the toctrees and each call of the event handlers connected by Sphinx and the
+extensions.
+
+The profiling is enabled by setting the `build_profile_dir` config value to the directory where the
+reports are written at the end of the build:
+
+- `build_profile.json`: the duration of the phases, and the timings aggregated per document and per
+  event handler, slowest first;
+- `build_profile.speedscope.json`: the timeline of each process, to open in https://speedscope.app.
+
+Timings are recorded in every process of a parallel build: the workers append theirs to a file after
+each document, and the main process merges them when writing the reports.
+"""
+
+import functools
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from sphinx.environment import BuildEnvironment
+from sphinx.environment.adapters import toctree
+from sphinx.util import logging
+
+JSON_REPORT_FILE = 'build_profile.json'
+SPEEDSCOPE_REPORT_FILE = 'build_profile.speedscope.json'
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+logger = logging.getLogger(__name__)
+
+# The timings recorded by the current process and not yet saved, as tuples of
+# (category, name, document, start, end, pid).
+_records = []
+# The document being read, resolved or written by the current process.
+_current_doc = None
+# The process running the build, and the directory where the workers save their timings.
+_main_pid = None
+_records_dir = None
+
+
+def record(category, name, start):
+    _records.append((category, name, _current_doc, start, time.perf_counter(), os.getpid()))
+
+
+def save_records():
+    """ Append the timings recorded by a worker process to its file, as the worker will exit without
+    returning them.
+    """
+    pid = os.getpid()
+    if pid != _main_pid and _records:
+        with Path(_records_dir, f'{pid}.json').open('a') as f:
+            # Skip the records inherited from the main process when the worker was forked.
+            f.writelines(json.dumps(record_) + '\n' for record_ in _records if record_[-1] == pid)
+        _records.clear()
+
+
+def profile_handler(event, handler):
+    """ Return an event handler timing the calls of another. """
+    module = getattr(handler, '__module__', None) or 'conf'  # conf.py is run without module name.
+    name = f'{event}: {module}.{getattr(handler, "__qualname__", handler)}'
+
+    @functools.wraps(handler)
+    def profiled_handler(app, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return handler(app, *args, **kwargs)
+        finally:
+            record('handler', name, start)
+
+    return profiled_handler
+
+
+def profile_method(owner, method_name, category, get_docname=None):
+    """ Replace a method of a class or an object by a method timing its calls.
+
+    :param get_docname: If set, the method processes a document, returned by `get_docname` from the
+                        arguments of the method.
+    """
+    method = getattr(owner, method_name)
+    name = f'{getattr(owner, "__name__", type(owner).__name__)}.{method_name}'
+
+    @functools.wraps(method)
+    def profiled_method(*args, **kwargs):
+        global _current_doc
+        previous_doc = _current_doc
+        if get_docname:
+            _current_doc = get_docname(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record(category, name, start)
+            _current_doc = previous_doc
+            if get_docname and previous_doc is None:
+                save_records()
+
+    setattr(owner, method_name, profiled_method)
+
+
+def start_profiling(app, config):
+    """ Time the event handlers connected so far, and those connected from now on. """
+    if not config.build_profile_dir:
+        return
+
+    for event, listeners in app.events.listeners.items():
+        listeners[:] = [
+            listener if getattr(listener.handler, '__module__', None) == __name__
+            else listener._replace(handler=profile_handler(event, listener.handler))
+            for listener in listeners
+        ]
+    connect = app.events.connect
+
+    @functools.wraps(connect)
+    def profiled_connect(event, callback, priority):
+        return connect(event, profile_handler(event, callback), priority)
+
+    app.events.connect = profiled_connect
+
+
+def profile_builder(app):
+    """ Time the phases of the build and the processing of each document. """
+    global _main_pid, _records_dir
+    if not app.config.build_profile_dir:
+        return
+
+    _main_pid = os.getpid()
+    _records_dir = tempfile.mkdtemp(prefix='build_profile_')
+    builder = app.builder
+    profile_method(builder, 'read', 'phase')
+    profile_method(builder, 'write', 'phase')
+    profile_method(builder, 'read_doc', 'read', get_docname=lambda docname: docname)
+    profile_method(builder, 'write_doc', 'write', get_docname=lambda docname, doctree: docname)
+    profile_method(
+        BuildEnvironment, 'get_and_resolve_doctree', 'resolve',
+        get_docname=lambda env, docname, *args, **kwargs: docname,
+    )
+    profile_method(toctree.TocTree, 'resolve', 'toctree')
+
+
+def load_records():
+    """ Return the timings of all the processes, and remove the files of the workers. """
+    records = [tuple(record_) for record_ in _records]
+    for records_file in Path(_records_dir).iterdir():
+        with records_file.open() as f:
+            records.extend(tuple(json.loads(line)) for line in f)
+    shutil.rmtree(_records_dir, ignore_errors=True)
+    return records
+
+
+def get_json_report(records):
+    """ Aggregate the timings per phase, per document and per event handler. """
+    phases = defaultdict(float)
+    documents = defaultdict(lambda: defaultdict(float))
+    handlers = {}
+    for category, name, docname, start, end, _pid in records:
+        duration = end - start
+        if category == 'phase':
+            phases[name.split('.')[-1]] += duration
+            continue
+        if docname:
+            documents[docname][category] += duration
+        if category == 'handler':
+            stats = handlers.setdefault(name, {'calls': 0, 'total': 0.0, 'max': 0.0})
+            stats['calls'] += 1
+            stats['total'] += duration
+            if duration > stats['max']:
+                stats.update(max=duration, max_document=docname)
+
+    for timings in documents.values():
+        # Handlers and toctrees are timed within the reading, resolving and writing of documents.
+        timings['total'] = timings['read'] + timings['resolve'] + timings['write']
+    return {
+        'phases': dict(phases),
+        'documents': dict(sorted(
+            ((docname, dict(timings)) for docname, timings in documents.items()),
+            key=lambda item: item[1]['total'], reverse=True,
+        )),
+        'handlers': dict(sorted(handlers.items(), key=lambda item: item[1]['total'], reverse=True)),
+    }
+
+
+def get_speedscope_report(records):
+    """ Return the timeline of each process in speedscope's evented format. """
+    frames, frame_indexes = [], {}
+    records_by_pid = defaultdict(list)
+    for category, name, docname, start, end, pid in records:
+        frame_name = f'{name} ({docname})' if docname and category != 'handler' else name
+        if frame_name not in frame_indexes:
+            frame_indexes[frame_name] = len(frames)
+            frames.append({'name': frame_name})
+        records_by_pid[pid].append((start, end, frame_indexes[frame_name]))
+
+    profiles = []
+    for pid, intervals in sorted(records_by_pid.items(), key=lambda item: item[0] != _main_pid):
+        # Nested intervals start after and end before their parents; open the parents first.
+        intervals.sort(key=lambda interval: (interval[0], -interval[1]))
+        events, open_intervals = [], []
+        for start, end, frame in intervals:
+            while open_intervals and open_intervals[-1][0] <= start:
+                close_end, close_frame = open_intervals.pop()
+                events.append({'type': 'C', 'frame': close_frame, 'at': close_end})
+            end = min(end, open_intervals[-1][0]) if open_intervals else end
+            events.append({'type': 'O', 'frame': frame, 'at': start})
+            open_intervals.append((end, frame))
+        while open_intervals:
+            close_end, close_frame = open_intervals.pop()
+            events.append({'type': 'C', 'frame': close_frame, 'at': close_end})
+        profiles.append({
+            'type': 'evented',
+            'name': 'Main process' if pid == _main_pid else f'Worker {pid}',
+            'unit': 'seconds',
+            'startValue': intervals[0][0],
+            'endValue': events[-1]['at'],
+            'events': events,
+        })
+    return {
+        '$schema': SPEEDSCOPE_SCHEMA,
+        'name': 'Sphinx build',
+        'shared': {'frames': frames},
+        'profiles': profiles,
+    }
+
+
+def write_reports(app, exception):
+    if not app.config.build_profile_dir or _records_dir is None:
+        return
+
+    records = load_records()
+    profile_dir = Path(app.confdir, app.config.build_profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    with Path(profile_dir, JSON_REPORT_FILE).open('w') as f:
+        json.dump(get_json_report(records), f, indent=2)
+    with Path(profile_dir, SPEEDSCOPE_REPORT_FILE).open('w') as f:
+        json.dump(get_speedscope_report(records), f)
+    logger.info("Build profile written in %s", profile_dir)
+
+
+def setup(app):
+    app.add_config_value('build_profile_dir', None, '')
+    app.connect('config-inited', start_profiling)
+    app.connect('builder-inited', profile_builder)
+    app.connect('build-finished', write_reports)
+
+    return {
+        'parallel_read_safe': True,
+        'parallel_write_safe': True
+    }
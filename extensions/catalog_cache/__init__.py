@@ -0,0 +1,136 @@
+""" Compile the message catalogs of translated builds through a content-hashed cache.
+
+Sphinx compiles the `.po` files of the build language into `.mo` files whenever the `.po` files are
+more recent, e.g., after every fresh checkout, and every compiled `.mo` file makes the documents of
+its domain outdated. Instead, the catalogs are compiled once per content into a cache, in parallel,
+and the `.mo` files are only written when their content changes.
+
+The compiled catalogs are then loaded once, in a lookup table mapping each domain (see the
+`docname_to_domain` override in conf.py) to its translations, for all the documents of that domain.
+"""
+
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import babel
+from babel.messages.mofile import write_mo
+from babel.messages.pofile import read_po
+from sphinx.locale import init as init_locale
+from sphinx.transforms import i18n
+from sphinx.util import logging
+from sphinx.util.i18n import CatalogRepository
+
+CACHE_DIR = Path('.odoo-docs-cache', 'catalogs')
+
+logger = logging.getLogger(__name__)
+
+# The translations of each (language, domain), loaded once for all the documents of the domain.
+_catalogs = {}
+
+
+def compile_catalog(po_path, mo_path, language, charset, use_fuzzy):
+    """ Compile a `.po` file into a `.mo` file, which is only created once complete. """
+    with open(po_path, encoding=charset) as po_file:
+        catalog = read_po(po_file, language)
+    tmp_path = f'{mo_path}.tmp'
+    with open(tmp_path, 'wb') as mo_file:
+        write_mo(mo_file, catalog, use_fuzzy)
+    os.replace(tmp_path, mo_path)
+
+
+def get_catalog_digest(catalog, language, use_fuzzy):
+    """ Return the hash of the content of a `.po` file and of the options of its compilation. """
+    digest = hashlib.sha1(Path(catalog.po_path).read_bytes())
+    digest.update(f'{language}:{use_fuzzy}:{babel.__version__}'.encode())
+    return digest.hexdigest()
+
+
+def update_catalogs(app):
+    """ Write the `.mo` files of the build language whose `.po` file changed, compiling the ones that
+    are not cached yet in parallel, then load them in the lookup table of `init_catalog`.
+    """
+    language = app.config.language
+    if not language or not app.builder.use_message_catalog:
+        return
+
+    catalogs = list(CatalogRepository(
+        app.srcdir, app.config.locale_dirs, language, app.config.source_encoding
+    ).catalogs)
+    if not catalogs:
+        return
+
+    use_fuzzy = app.config.gettext_allow_fuzzy_translations
+    cache_dir = Path(app.confdir, CACHE_DIR, language)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached_paths = {}
+    for catalog in catalogs:
+        digest = get_catalog_digest(catalog, language, use_fuzzy)
+        cached_paths[catalog] = cache_dir / f'{catalog.domain}.{digest}.mo'
+
+    stale_catalogs = [catalog for catalog in catalogs if not cached_paths[catalog].exists()]
+    if stale_catalogs:
+        logger.info("Compiling %d message catalog(s)...", len(stale_catalogs))
+        with ProcessPoolExecutor() as executor:
+            futures = {
+                catalog: executor.submit(
+                    compile_catalog, catalog.po_path, cached_paths[catalog], language,
+                    catalog.charset, use_fuzzy,
+                )
+                for catalog in stale_catalogs
+            }
+            for catalog, future in futures.items():
+                try:
+                    future.result()
+                except Exception as exc:
+                    logger.warning("Could not compile %s: %s", catalog.po_path, exc)
+                    del cached_paths[catalog]
+
+    written = 0
+    for catalog, cached_path in cached_paths.items():
+        # Remove the outdated compilations of the catalog.
+        for outdated_path in cache_dir.glob(f'{catalog.domain}.*.mo'):
+            if outdated_path != cached_path:
+                outdated_path.unlink()
+        # Only write the `.mo` file if it changed, as it makes the documents of its domain outdated.
+        mo_path = Path(catalog.mo_path)
+        if not mo_path.exists() or mo_path.read_bytes() != cached_path.read_bytes():
+            shutil.copyfile(cached_path, mo_path)
+            written += 1
+    logger.info(
+        "Message catalogs: %d compiled, %d updated, %d unchanged.",
+        len(stale_catalogs), written, len(cached_paths) - written,
+    )
+
+    locale_dirs = [str(Path(app.srcdir, locale_dir)) for locale_dir in app.config.locale_dirs]
+    for catalog in cached_paths:
+        _catalogs[language, catalog.domain] = init_locale(locale_dirs, language, catalog.domain)
+
+
+def init_catalog(locale_dirs, language, catalog='sphinx', namespace='general'):
+    """ Return the translations of a domain from the lookup table, if loaded by `update_catalogs`.
+
+    Sphinx's `init_locale` loads the catalog of a domain again for each document, chaining the
+    loaded translations to the previous ones.
+    """
+    if namespace == 'general' and (language, catalog) in _catalogs:
+        return _catalogs[language, catalog]
+    return init_locale(locale_dirs, language, catalog, namespace)
+
+
+def disable_auto_build(app, config):
+    """ Prevent Sphinx from compiling the catalogs itself, as `update_catalogs` takes care of it. """
+    config.gettext_auto_build = False
+
+
+def setup(app):
+    i18n.init_locale = init_catalog
+    app.connect('config-inited', disable_auto_build)
+    app.connect('builder-inited', update_catalogs)
+
+    return {
+        'parallel_read_safe': True,
+        'parallel_write_safe': True
+    }
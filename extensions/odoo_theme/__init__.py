@@ -1,21 +1,25 @@
+import gc
+import hashlib
+from pathlib import Path
+
 from docutils import nodes
 from docutils.parsers.rst import roles
-from sphinx import addnodes
 from sphinx.environment.adapters import toctree
+from sphinx.util import url_re
 
-from . import pygments_override, translator
+from . import assets, pygments_override, translator
 
 
 def setup(app):
     app.set_translator('html', translator.BootstrapTranslator)
 
     app.connect('html-page-context', set_missing_meta)
+    app.connect('html-page-context', set_shared_menu)
+    app.connect('env-updated', clear_shared_toctrees)
+    app.connect('env-get-updated', update_shared_menu)
 
-    app.add_js_file('js/utils.js')  # Keep in first position
-    app.add_js_file('js/layout.js')
-    app.add_js_file('js/menu.js')
-    app.add_js_file('js/page_toc.js')
-    app.add_js_file('js/switchers.js')
+    app.connect('config-inited', assets.set_bundle_names)
+    app.connect('builder-inited', assets.write_bundles)
 
     roles.register_canonical_role('icon', icon_role)
 
@@ -28,6 +32,49 @@ def set_missing_meta(app, pagename, templatename, context, doctree):
     if context.get('meta') is None:  # Pages without title (used with `include::`) have no meta
         context['meta'] = {}
 
+def set_shared_menu(app, pagename, templatename, context, doctree):
+    """ Make the page load the global menu from a file shared by all the pages, instead of rendering
+    it inline.
+
+    The shared menu is enabled with sphinx-build's option `-A shared_menu=True`. It is written once
+    per build, with its content hash in its name so that it can be cached by the browsers, and the
+    entries leading to the page are marked as 'current' client-side. See `menu.js`.
+    """
+    if context.get('shared_menu'):
+        context['shared_menu_file'] = _shared_menu_file
+
+def update_shared_menu(app, env):
+    """ Write the shared menu once the documents are read, before the pages are written.
+
+    If the menu changed, the menus of the previous builds are removed and all the pages are written
+    again, so that none of them references a removed menu.
+    """
+    global _shared_menu_file
+    if app.builder.format != 'html' or not app.config.html_context.get('shared_menu'):
+        return []
+    # Written by the main process, before the workers are forked.
+    _shared_menu_file, changed = write_shared_menu(app.builder)
+    return env.found_docs if changed else []
+
+def write_shared_menu(builder):
+    """ Render the global menu with URLs relative to its own file and write it in the output, in
+    place of the menus of the previous builds.
+
+    :return: The path of the file, relative to the output directory, and whether the menu changed
+             since the previous build.
+    :rtype: tuple
+    """
+    menu = toctree.TocTree(builder.env).get_toctree_for(
+        SHARED_MENU_DOCNAME, builder, collapse=False, titles_only=True, includehidden=False
+    )
+    fragment = builder.render_partial(menu)['fragment']
+    digest = hashlib.sha1(fragment.encode()).hexdigest()[:12]
+    filename = f'{SHARED_MENU_DOCNAME}.{digest}.html'
+    menu_path = Path(builder.outdir, filename)
+    changed = not menu_path.exists()
+    assets.write_static_file(menu_path.parent, menu_path.name, fragment.encode())
+    return filename, changed
+
 class Monkey:
     """ Replace patched method of an object by a new method receiving the old one in argument. """
     def __init__(self, obj):
@@ -37,80 +84,150 @@ class Monkey:
         old = getattr(self.obj, name)
         setattr(self.obj, name, lambda self_, *args, **kwargs: fn(old, self_, *args, **kwargs))
 
+# The toctrees resolved once for all the pages of the build, with the targets of their references.
+# See `resolve`.
+_shared_toctrees = {}
+# The docname from which the URLs of the shared menu are made relative, and the file of the menu
+# once written for the current build. See `update_shared_menu`.
+SHARED_MENU_DOCNAME = '_static/menu'
+_shared_menu_file = None
+
+
+class _DocnameUriBuilder:
+    """ Proxy of a builder making `TocTree.resolve` use the docname of the targets as URIs. """
+    def __init__(self, builder):
+        self.builder = builder
+    def __getattr__(self, name):
+        return getattr(self.builder, name)
+    def get_relative_uri(self, from_, to, typ=None):
+        return to
+
 @Monkey(toctree.TocTree)
-def resolve(old_resolve, tree, docname, *args, **kwargs):
-
-    def _update_toctree_nodes(_node) -> None:
-        """ Make necessary changes to Docutils' nodes of the toc.
-
-        Internal structure of toc nodes:
-        <ul>
-            <li>
-                <p><a/></p>
-                <ul>
-                    ...
-                </ul>
-            </li>
-            <li/>
-        <ul/>
-        """
-        if isinstance(_node, nodes.reference):  # The node is a reference (<a/>)
-            _node_docname = _get_docname(_node)
-            _clear_reference_if_empty_page(_node, _node_docname)
-            _set_docname_as_class(_node, _node_docname)
-        elif isinstance(_node, (addnodes.compact_paragraph, nodes.bullet_list, nodes.list_item)):
-            for _subnode in _node.children:
-                _update_toctree_nodes(_subnode)
-
-    def _get_docname(_node):
-        """ Return the docname of the targeted document.
-
-        docname = some_common_root/foo/bar/the_page_being_rendered
-        _ref = ../../contributing/documentation
-        _path_parts = ['..', '..', 'contributing', 'documentation']
-        _res = ['some_common_root', 'contributing', 'documentation']
-        _docname = some_common_root/contributing/documentation
-
-        :return: The docname of the document targeted by `_node`, i.e. the relative path from the
-                 documentation source directory (the `content/` directory)
-        :rtype: str
-        """
-        _ref = _node['refuri'].replace('.html', '')
-        _parent_directory_occurrences = _ref.count('..')
-        if not _parent_directory_occurrences and '/' not in docname:
-            # The current document is at the root of the documentation source directory
-            # (e.g. docname == 'index'|'applications'|...). i.e., the ref is already the docname.
-            _docname = _ref
-        else:
-            _path_parts = _ref.split('/')
-            _res = docname.split('/')[:-(_parent_directory_occurrences+1)] \
-                   + _path_parts[_parent_directory_occurrences:]
-            _docname = '/'.join(_res)
-        return _docname
-
-    def _clear_reference_if_empty_page(_reference_node, _node_docname):
-        """ Clear reference of 'empty' toctree pages.
-
-        Inspect parent node's siblings to determine whether the node references a toc and, if so,
-        clear its reference URL. (<a href="#"/>)
-        If the page has the `show-content` metadata, don't clear the reference.
-        """
-        if _node_docname and any(
-            isinstance(_subnode, nodes.bullet_list)
-            for _subnode in _reference_node.parent.parent.children
-        ):  # The node references a toc
-            if 'show-content' not in tree.env.metadata[_node_docname]:
-                _reference_node['refuri'] = '#'  # The page must not be accessible
-
-    def _set_docname_as_class(_reference_node, _node_docname):
-        _node_docname = _node_docname or docname  # refuri==None <-> href="#"
-        _reference_node.parent.parent['classes'].append(f'o_menu_{_node_docname.replace("/", "_")}')
-
-    resolved_toc = old_resolve(tree, docname, *args, **kwargs)
-    if resolved_toc:  # `resolve` returns None if the depth of the TOC to resolve is too high
-        _update_toctree_nodes(resolved_toc)
+def resolve(
+    old_resolve, tree, docname, builder, toctree_node, prune=True, maxdepth=0, titles_only=False,
+    collapse=False, includehidden=False,
+):
+    """ Resolve a toctree and make the necessary changes to its nodes for the theme.
+
+    The toctree is resolved with the docnames of the targets as URIs, which are made relative to
+    the current document afterwards. The toctrees of the root document (i.e., the global menu) are
+    the same on all pages unless they are collapsed or pruned to a max depth: they are resolved only
+    once per build, and each page gets a copy with the entries leading to it marked as 'current'.
+    """
+    shared = (
+        toctree_node['parent'] == tree.env.config.root_doc and prune and not collapse
+        and (maxdepth or toctree_node.get('maxdepth', -1)) <= 0
+    )
+    key = (toctree_node['parent'], toctree_node.line, titles_only, includehidden)
+    if shared and key in _shared_toctrees:
+        shared_toc, targets = _shared_toctrees[key]
+    else:
+        shared_toc = old_resolve(
+            tree, None if shared else docname, _DocnameUriBuilder(builder), toctree_node,
+            prune, maxdepth, titles_only, collapse, includehidden,
+        )
+        targets = shared_toc and _update_toctree_nodes(tree.env, shared_toc)
+        if shared:
+            _shared_toctrees[key] = (shared_toc, targets)
+
+    if not shared_toc:  # `resolve` returns None if the depth of the TOC to resolve is too high
+        return None
+    resolved_toc = _copy_toctree(shared_toc) if shared else shared_toc
+    _marked_paragraph = None  # The paragraph whose next references are no longer marked.
+    for _reference, (_target, _anchorname, _rebase) in zip(
+        resolved_toc.traverse(nodes.reference), targets
+    ):
+        if _target is None:  # External URL
+            continue
+        if shared and _target == docname and _reference.parent is not _marked_paragraph:
+            if not _mark_current_branch(_reference, _anchorname):
+                _marked_paragraph = _reference.parent
+        if _rebase:
+            _reference['refuri'] = builder.get_relative_uri(docname, _target) + _anchorname
     return resolved_toc
 
+def _copy_toctree(toc):
+    """ Return a deep copy of a toctree.
+
+    The garbage collector is paused during the copy: the thousands of nodes it allocates would
+    otherwise trigger collections going through the whole environment.
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return toc.deepcopy()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _update_toctree_nodes(env, resolved_toc):
+    """ Make necessary changes to Docutils' nodes of the toc.
+
+    Internal structure of toc nodes:
+    <ul>
+        <li>
+            <p><a/></p>
+            <ul>
+                ...
+            </ul>
+        </li>
+        <li/>
+    <ul/>
+
+    - Clear the reference of 'empty' toctree pages: if the node references a toc (one of its parent
+      node's siblings is a list), its reference URL is cleared (<a href="#"/>) so that the page is
+      not accessible, unless the page has the `show-content` metadata.
+    - Set the docname of the targeted document as class of the entry.
+
+    :return: The docname of the document targeted by each reference (None for external URLs), its
+             anchor, and whether its URL must be made relative to the current document.
+    :rtype: list
+    """
+    targets = []
+    for reference in resolved_toc.traverse(nodes.reference):
+        anchorname = reference.get('anchorname', '')
+        if url_re.match(reference['refuri']):
+            targets.append((None, anchorname, False))
+            continue
+        target = reference['refuri'][:len(reference['refuri']) - len(anchorname)]
+        rebase = True
+        siblings = reference.parent.parent.children
+        if any(isinstance(sibling, nodes.bullet_list) for sibling in siblings):  # References a toc
+            if 'show-content' not in env.metadata[target]:
+                reference['refuri'] = '#'  # The page must not be accessible
+                rebase = False
+        reference.parent.parent['classes'].append(f'o_menu_{target.replace("/", "_")}')
+        targets.append((target, anchorname, rebase))
+    return targets
+
+def _mark_current_branch(reference, anchorname):
+    """ Mark the entries leading to the current document, as `TocTree.resolve` does.
+
+    :return: False if the entry of the reference was already marked as current, in which case
+             `TocTree.resolve` no longer marks the next references of the same paragraph.
+    :rtype: bool
+    """
+    if not anchorname:
+        node = reference
+        while node:
+            node['classes'].append('current')
+            node = node.parent
+    if reference.parent.parent.get('iscurrent'):
+        return False
+    node = reference
+    while node:
+        node['iscurrent'] = True
+        node = node.parent
+    return True
+
+def clear_shared_toctrees(app, env):
+    """ Forget the toctrees and the menu resolved for the previous build, as the documents may have
+    changed.
+    """
+    global _shared_menu_file
+    _shared_toctrees.clear()
+    _shared_menu_file = None
+
 
 def icon_role(name, rawtext, text, lineno, inliner, options=None, content=None):
     """ Implement an `icon` role for Odoo and Font Awesome icons. """
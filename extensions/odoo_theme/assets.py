@@ -0,0 +1,140 @@
+""" Bundle the scripts and the stylesheet of the theme into files named after the hash of their
+content, so that they can be served with immutable cache headers.
+
+The scripts are concatenated into `_static/theme.<hash>.js`, and the stylesheet is compiled with
+libsass into `_static/style.<hash>.css`. The compiled stylesheet is cached per content of the SCSS
+files, so that it is only compiled once for all the builds (e.g., of each language).
+"""
+
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import sass
+from sphinx.util import logging
+
+STATIC_DIR = Path(__file__).parent / 'static'
+SCRIPTS = ['utils.js', 'layout.js', 'menu.js', 'page_toc.js', 'switchers.js']  # utils.js first
+STYLESHEET = 'style.scss'
+CACHE_DIR = Path('.odoo-docs-cache', 'assets')
+# The hashed names of the bundles, as referenced by the pages.
+BUNDLE_NAME_RE = re.compile(r'\b(?:style\.[0-9a-f]{12}\.css|theme\.[0-9a-f]{12}\.js)\b')
+
+logger = logging.getLogger(__name__)
+
+# The content of the bundle of scripts, named after its hash by `set_bundle_names`.
+_script_bundle = None
+
+
+def bundle_scripts():
+    """ Return the scripts of the theme, concatenated.
+
+    The scripts are not minified: the bundle is served compressed, and stripping their comments
+    would require parsing their strings, template literals and regular expressions.
+    """
+    return '\n;\n'.join(
+        Path(STATIC_DIR, 'js', script).read_text(encoding='utf-8') for script in SCRIPTS
+    ).encode()
+
+
+def get_stylesheet_digest():
+    """ Return the hash of the content of the SCSS files and of the version of libsass. """
+    digest = hashlib.sha1(sass.libsass_version.encode())
+    for scss_path in sorted(STATIC_DIR.rglob('*.scss')):
+        digest.update(str(scss_path.relative_to(STATIC_DIR)).encode())
+        digest.update(scss_path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def compile_stylesheet(cache_dir, filename):
+    """ Return the compiled stylesheet of the theme, compiling it unless it is already cached. """
+    cached_path = Path(cache_dir, filename)
+    if not cached_path.exists():
+        logger.info("Compiling the stylesheet...")
+        stylesheet = sass.compile(
+            filename=str(STATIC_DIR / STYLESHEET), output_style='compressed'
+        )
+        write_static_file(cache_dir, filename, stylesheet.encode())
+    return cached_path.read_bytes()
+
+
+def write_static_file(directory, filename, content):
+    """ Write a file, unless it exists already, and remove the files of previous contents.
+
+    The name of the file must be made of a prefix, the hash of its content and an extension.
+    """
+    path = Path(directory, filename)
+    prefix, _digest, extension = filename.split('.')
+    for outdated_path in path.parent.glob(f'{prefix}.*.{extension}'):
+        if outdated_path != path:
+            outdated_path.unlink()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{filename}.{os.getpid()}.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+
+
+def set_bundle_names(app, config):
+    """ Make the pages reference the bundles by their hashed names.
+
+    The names are set before the HTML builder compares the config with the one of the previous
+    build, so that the pages are written again when the content of the bundles changes.
+    """
+    global _script_bundle
+    _script_bundle = bundle_scripts()
+    config.html_style = f'style.{get_stylesheet_digest()}.css'
+    config.html_context['theme_script'] = (
+        f'theme.{hashlib.sha1(_script_bundle).hexdigest()[:12]}.js'
+    )
+
+
+def write_bundles(app):
+    """ Write the bundles in the static directory of the output. """
+    if app.builder.format != 'html':
+        return
+
+    static_dir = Path(app.outdir, '_static')
+    stylesheet = compile_stylesheet(Path(app.confdir, CACHE_DIR), app.config.html_style)
+    write_static_file(static_dir, app.config.html_style, stylesheet)
+    write_static_file(static_dir, app.config.html_context['theme_script'], _script_bundle)
+
+
+def refresh_bundles(outdir):
+    """ Write the bundles in the static directory of a built output, and make its pages reference
+    them, so that changes to the theme are visible without building the documentation again.
+
+    The output directories of other builds nested in this one, e.g., those of the translations,
+    are left alone.
+    """
+    config = SimpleNamespace(html_style=None, html_context={})
+    set_bundle_names(None, config)
+    static_dir = Path(outdir, '_static')
+    stylesheet = compile_stylesheet(Path(__file__).parents[2] / CACHE_DIR, config.html_style)
+    bundle_names = {
+        '.css': config.html_style, '.js': config.html_context['theme_script'],
+    }
+    for dirpath, dirnames, filenames in os.walk(outdir):
+        dirnames[:] = [
+            dirname for dirname in dirnames
+            if not os.path.exists(os.path.join(dirpath, dirname, '.buildinfo'))
+        ]
+        for filename in filenames:
+            if filename.endswith('.html'):
+                page_path = Path(dirpath, filename)
+                page = page_path.read_text(encoding='utf-8')
+                refreshed_page = BUNDLE_NAME_RE.sub(
+                    lambda match: bundle_names[os.path.splitext(match[0])[1]], page
+                )
+                if refreshed_page != page:
+                    page_path.write_text(refreshed_page, encoding='utf-8')
+    write_static_file(static_dir, config.html_style, stylesheet)
+    write_static_file(static_dir, config.html_context['theme_script'], _script_bundle)
+
+
+if __name__ == '__main__':
+    # Usage: python extensions/odoo_theme/assets.py OUTPUT_DIR (see `make static`)
+    refresh_bundles(sys.argv[1])
@@ -1,9 +1,14 @@
 /* global _prepareAccordion */ //see utils.js
 (function ($) {
 
-    document.addEventListener('DOMContentLoaded', () => {
+    document.addEventListener('DOMContentLoaded', async () => {
         const navigationMenu = document.getElementById('o_main_toctree');
 
+        // Load the menu shared by all the pages if it is not rendered in the page.
+        if (navigationMenu.dataset.menuUrl && !await _loadSharedMenu(navigationMenu)) {
+            return;
+        }
+
         // Allow to automatically collapse and expand TOC entries
         _prepareAccordion(navigationMenu);
 
@@ -21,6 +26,87 @@
         _scrollToDeepestActiveTocEntry(deepestActiveTocEntries);
     });
 
+    /**
+     * Insert the global menu shared by all the pages into the navigation menu, and flag the TOC
+     * entries leading to the displayed page with the `current` class as Sphinx does when the menu
+     * is rendered in the page.
+     *
+     * The name of the menu file contains the hash of its content; it is fetched once and kept in
+     * the session storage for the next pages.
+     *
+     * @param {HTMLElement} navigationMenu - The navigation menu.
+     * @return {Boolean} - Whether the menu could be loaded.
+     */
+    const _loadSharedMenu = async navigationMenu => {
+        const menuUrl = new URL(navigationMenu.dataset.menuUrl, document.baseURI).href;
+        let menuHtml = _getSessionItem(menuUrl);
+        if (menuHtml === null) {
+            try {
+                const response = await fetch(menuUrl);
+                if (!response.ok) {
+                    return false;
+                }
+                menuHtml = await response.text();
+            } catch {
+                return false; // The menu cannot be fetched, e.g., when browsing local files.
+            }
+            _setSessionItem(menuUrl, menuHtml);
+        }
+        navigationMenu.innerHTML = menuHtml;
+
+        // The URLs of the menu are relative to its file rather than to the displayed page.
+        navigationMenu.querySelectorAll('a[href]').forEach(link => {
+            const href = link.getAttribute('href');
+            if (href !== '#') { // Keep the references of the TOC entries without page.
+                link.setAttribute('href', new URL(href, menuUrl).href);
+            }
+        });
+
+        // Flag the TOC entries of the displayed page, except those targeting a section of it, and
+        // all their ancestors. Their links target the top of the page, as Sphinx renders them.
+        const entryClass = CSS.escape(navigationMenu.dataset.menuEntry);
+        navigationMenu.querySelectorAll(`li.${entryClass}`).forEach(tocEntry => {
+            const link = tocEntry.querySelector('a');
+            if (link && !link.hash) {
+                link.setAttribute('href', '#');
+                let element = link;
+                while (element !== navigationMenu) {
+                    element.classList.add('current');
+                    element = element.parentElement;
+                }
+            }
+        });
+        return true;
+    };
+
+    /**
+     * Return an item of the session storage, or null if it is missing or the storage is disabled.
+     *
+     * @param {String} key - The key of the item.
+     * @return {String|null} - The value of the item.
+     */
+    const _getSessionItem = key => {
+        try {
+            return sessionStorage.getItem(key);
+        } catch {
+            return null;
+        }
+    };
+
+    /**
+     * Save an item in the session storage, if it is enabled and not full.
+     *
+     * @param {String} key - The key of the item.
+     * @param {String} value - The value of the item.
+     */
+    const _setSessionItem = (key, value) => {
+        try {
+            sessionStorage.setItem(key, value);
+        } catch {
+            // The menu will be fetched again (from the HTTP cache) on the next page.
+        }
+    };
+
     /**
      * Add the relevant classes on the TOC entries (and lists) whose page is displayed.
      *
@@ -0,0 +1,144 @@
+""" Write precompressed `.gz` and `.br` siblings of the text files of the HTML output, so that they
+can be served as is instead of being compressed on the fly.
+
+The precompression is enabled by setting the `precompress_output` config value. At the end of the
+build, the files whose content changed since the last precompression of the output directory are
+compressed again in a pool of processes, and the sizes of the output directory before and after
+compression are logged.
+
+Brotli compression requires the `brotli` package; without it, only the `.gz` files are written.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sphinx.util import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_SUFFIXES = ('.html', '.css', '.js', '.svg', '.json')
+GZIP_SUFFIX = '.gz'
+BROTLI_SUFFIX = '.br'
+# The content hash of the files compressed by the previous builds, stored with the doctrees.
+MANIFEST_FILE = 'precompress.json'
+
+logger = logging.getLogger(__name__)
+
+
+def get_compressors():
+    """ Return the suffix of each compressed sibling and the function compressing its content. """
+    compressors = {GZIP_SUFFIX: lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli:
+        compressors[BROTLI_SUFFIX] = lambda data: brotli.compress(data, quality=11)
+    return compressors
+
+
+def compress_file(path, previous_digest):
+    """ Write the compressed siblings of a file, unless its content and its siblings are unchanged.
+
+    :return: The hash of the content of the file, whether it was compressed, and the size of the
+             file and of each of its siblings.
+    :rtype: tuple
+    """
+    data = Path(path).read_bytes()
+    digest = hashlib.sha1(data).hexdigest()
+    compressors = get_compressors()
+    compressed = digest != previous_digest or not all(
+        os.path.exists(path + suffix) for suffix in compressors
+    )
+    sizes = {'': len(data)}
+    for suffix, compress in compressors.items():
+        if compressed:
+            compressed_data = compress(data)
+            tmp_path = f'{path}{suffix}.tmp'
+            with open(tmp_path, 'wb') as compressed_file:
+                compressed_file.write(compressed_data)
+            os.replace(tmp_path, path + suffix)
+            sizes[suffix] = len(compressed_data)
+        else:
+            sizes[suffix] = os.path.getsize(path + suffix)
+    return digest, compressed, sizes
+
+
+def get_output_files(outdir):
+    """ Return the files of the output directory to compress, and the compressed siblings whose
+    file was removed.
+
+    The output directories of other builds nested in this one, e.g., those of the translations,
+    are skipped: they are compressed at the end of their own build.
+    """
+    files, orphans = [], []
+    for dirpath, dirnames, filenames in os.walk(outdir):
+        dirnames[:] = [
+            dirname for dirname in dirnames
+            if not dirname.startswith('.')
+            and not os.path.exists(os.path.join(dirpath, dirname, '.buildinfo'))
+        ]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if filename.endswith(COMPRESSED_SUFFIXES):
+                files.append(path)
+            elif filename.endswith((GZIP_SUFFIX, BROTLI_SUFFIX)):
+                source_path = os.path.splitext(path)[0]
+                if source_path.endswith(COMPRESSED_SUFFIXES) and not os.path.exists(source_path):
+                    orphans.append(path)
+    return files, orphans
+
+
+def format_size(size):
+    return f'{size / 2**20:.1f} MiB'
+
+
+def precompress_output(app, exception):
+    if exception or not app.config.precompress_output or app.builder.format != 'html':
+        return
+
+    outdir = app.outdir
+    manifest_path = Path(app.doctreedir, MANIFEST_FILE)
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    files, orphans = get_output_files(outdir)
+    for orphan in orphans:
+        os.remove(orphan)
+
+    logger.info("Precompressing the output...")
+    relative_paths = [os.path.relpath(path, outdir) for path in files]
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(
+            compress_file, files, [manifest.get(path) for path in relative_paths], chunksize=64
+        ))
+
+    totals, compressed_count = {}, 0
+    new_manifest = {}
+    for relative_path, (digest, compressed, sizes) in zip(relative_paths, results):
+        new_manifest[relative_path] = digest
+        compressed_count += compressed
+        for suffix, size in sizes.items():
+            totals[suffix] = totals.get(suffix, 0) + size
+    manifest_path.write_text(json.dumps(new_manifest))
+
+    if not brotli:
+        logger.warning("The brotli package is not installed: only the .gz files were written.")
+    logger.info(
+        "Precompressed output of %s (%s): %d files, %d compressed, %d unchanged; %s",
+        outdir, app.config.language or 'en', len(files), compressed_count,
+        len(files) - compressed_count, ', '.join(
+            f'{suffix or "original"}: {format_size(size)}' for suffix, size in totals.items()
+        ),
+    )
+
+
+def setup(app):
+    app.add_config_value('precompress_output', False, '')
+    app.connect('build-finished', precompress_output)
+
+    return {
+        'parallel_read_safe': True,
+        'parallel_write_safe': True
+    }
@@ -1,35 +1,47 @@
 # Adapted from https://github.com/sphinx-contrib/redirects
 
+import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from sphinx.builders import html as builders
 from sphinx.util import logging as logging
 
 TEMPLATE = '<html><head><meta http-equiv="refresh" content="0; url=%s"/></head></html>'
+TEMPLATE_PREFIX = TEMPLATE.split('%s')[0]
+REDIRECTS_FILE_VERSION_RE = re.compile(r'(\d+)\.(\d+)\.txt$')
+JSON_MAP_FILE = 'redirects.json'
+NGINX_MAP_FILE = 'redirects.map'
 
 logger = logging.getLogger(__name__)
 
 
-def generate_redirects(app):
-    redirects_dir = Path(app.confdir, app.config.redirects_dir)
-    if not redirects_dir.exists():
-        logger.warning("Could not find redirects dir at '%s'", redirects_dir)
-        return
+def get_redirects_files(redirects_dir):
+    """ Return the files holding redirect rules, from the oldest version to the latest one. """
+    def version_key(redirects_file_):
+        match_ = REDIRECTS_FILE_VERSION_RE.search(redirects_file_.name)
+        return (int(match_.group(1)), int(match_.group(2))) if match_ else (-1, -1)
 
-    if not type(app.builder) == builders.StandaloneHTMLBuilder:
-        logger.info("Redirects are only supported by the 'html' builder. Skipping...")
-        return
+    return sorted(
+        (f for f in redirects_dir.iterdir() if not f.is_dir() and f.suffix == '.txt'),
+        key=lambda f: (version_key(f), f.name),
+    )
 
-    source_suffix = next(iter(app.config.source_suffix))
+
+def load_redirect_rules(redirects_dir, source_suffix):
+    """ Parse the redirect rules of all redirects files into a dict mapping the old source file of
+    each rule to its new source file.
+
+    The files are read from the oldest version to the latest one, so that the latest rule of a
+    source file overrides the older ones.
+    """
     escaped_source_suffix = source_suffix.replace('.', r'\.')
     pattern = re.compile(
         r'^[ \t]*([\w\-/]+{0})[ \t]+([\w\-/]+{0})[ \t]*(?:#.*)?$'.format(escaped_source_suffix)
     )
-    for redirects_file in redirects_dir.iterdir():
-        if redirects_file.is_dir() or redirects_file.suffix != '.txt':
-            continue
-
+    rules = {}
+    for redirects_file in get_redirects_files(redirects_dir):
         with redirects_file.open(mode='r') as f:
             for line in f.readlines():
                 # Exclude comment or empty lines.
@@ -50,21 +62,168 @@ def generate_redirects(app):
                 # Parse the rule.
                 from_file, to_file = match_result.groups()
                 logger.debug("Redirecting '%s' to '%s'", from_file, to_file)
+                rules[from_file] = to_file
+    return rules
+
+
+def compile_redirect_rules(rules, source_files):
+    """ Compile redirect rules into a graph where every redirection takes a single hop.
+
+    Chains of rules (A -> B, B -> C) are collapsed into their final target (A -> C, B -> C). A
+    chain stops at the first built source file, and the rules of built source files are dropped,
+    as their page is written over their redirection anyway.
+
+    :param dict rules: The new source file of each old source file.
+    :param set source_files: The source files of the documents that are built.
+    :return: The final target of each redirected source file, the cycles of rules (lists of source
+             files) that cannot be resolved, and the redirected source files whose final target
+             does not exist.
+    """
+    redirects, cycles, dangling = {}, [], []
+    resolved = {}  # The final target of the files already visited; None if caught in a cycle.
+    for from_file in rules:
+        chain, chain_files, file = [], set(), from_file
+        while (
+            file in rules and file not in source_files and file not in resolved
+            and file not in chain_files
+        ):
+            chain.append(file)
+            chain_files.add(file)
+            file = rules[file]
+
+        if file in resolved:
+            target = resolved[file]
+        elif file in chain_files:
+            cycles.append(chain[chain.index(file):])
+            target = None
+        else:
+            target = file
+        for chained_file in chain:
+            resolved[chained_file] = target
+
+    for from_file in rules:
+        target = resolved.get(from_file)
+        if target is None:
+            continue  # An existing source file, or a file caught in a cycle.
+        redirects[from_file] = target
+        if target not in source_files:
+            dangling.append(from_file)
+    return redirects, cycles, dangling
+
+
+def write_if_changed(path, content):
+    """ Write a file unless it already has the given content, and return whether it was written. """
+    try:
+        if path.read_text() == content:
+            return False
+    except OSError:
+        pass  # The file does not exist yet.
+    path.write_text(content)
+    return True
+
+
+def write_redirect_maps(outdir, redirects, source_suffix, prefix):
+    """ Write the redirections as server-side maps: a JSON object and an nginx `map` block.
+
+    The paths are relative to the output directory, prefixed by `prefix` in the nginx map.
+    """
+    html_redirects = {
+        from_file.replace(source_suffix, '.html'): to_file.replace(source_suffix, '.html')
+        for from_file, to_file in sorted(redirects.items())
+    }
+    write_if_changed(Path(outdir, JSON_MAP_FILE), json.dumps(html_redirects, indent=2) + '\n')
+    write_if_changed(Path(outdir, NGINX_MAP_FILE), ''.join(
+        f'{prefix}/{from_html_file} {prefix}/{to_html_file};\n'
+        for from_html_file, to_html_file in html_redirects.items()
+    ))
+
+
+def write_redirect_stubs(outdir, stubs):
+    """ Write the HTML files of the redirections, and remove those of the previous build that are
+    no longer needed.
+
+    Only the files that are missing or whose content changed are written, in a thread pool. The
+    files of the previous build are listed in its JSON map; they are only removed if they still are
+    redirections, as a page may since have been built in their place.
+
+    :param dict stubs: The content of each HTML file, by path relative to the output directory.
+    :return: The number of written and removed files.
+    """
+    try:
+        previous_stubs = json.loads(Path(outdir, JSON_MAP_FILE).read_text())
+    except (OSError, ValueError):
+        previous_stubs = {}
+    removed = 0
+    for html_file in previous_stubs.keys() - stubs.keys():
+        stale_path = Path(outdir, html_file)
+        try:
+            if stale_path.read_text().startswith(TEMPLATE_PREFIX):
+                stale_path.unlink()
+                removed += 1
+        except OSError:
+            pass  # Already removed.
+
+    paths = [Path(outdir, html_file) for html_file in stubs]
+    for directory in {path.parent for path in paths}:
+        directory.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor() as executor:
+        written = sum(executor.map(write_if_changed, paths, stubs.values()))
+    return written, removed
+
+
+def generate_redirects(app, env, docnames):
+    """ Write the redirections once the documents to build are known, i.e., without the source
+    files matching `exclude_patterns`, whose redirections must be kept.
+    """
+    redirects_dir = Path(app.confdir, app.config.redirects_dir)
+    if not redirects_dir.exists():
+        logger.warning("Could not find redirects dir at '%s'", redirects_dir)
+        return
 
-                # Prepare the source and destination paths.
-                to_path_prefix = '../' * from_file.count('/')
-                from_html_file = from_file.replace(source_suffix, '.html')
-                to_html_file = to_path_prefix + to_file.replace(source_suffix, '.html')
-                absolute_from_path = Path(app.builder.outdir) / from_html_file
+    if not type(app.builder) == builders.StandaloneHTMLBuilder:
+        logger.info("Redirects are only supported by the 'html' builder. Skipping...")
+        return
 
-                # Create the redirection.
-                absolute_from_path.parent.mkdir(parents=True, exist_ok=True)
-                absolute_from_path.write_text(TEMPLATE % to_html_file)
+    source_suffix = next(iter(app.config.source_suffix))
+    rules = load_redirect_rules(redirects_dir, source_suffix)
+    source_files = {f'{docname}{source_suffix}' for docname in env.found_docs}
+    redirects, cycles, dangling = compile_redirect_rules(rules, source_files)
+
+    for cycle in cycles:
+        logger.warning(
+            "Ignoring redirect rules forming a cycle: %s", ' -> '.join(cycle + cycle[:1])
+        )
+    if dangling:
+        logger.warning(
+            "%d redirect rule(s) lead to non-existing files; run with -v to list them.", len(dangling)
+        )
+        for from_file in dangling:
+            logger.verbose("Redirect rule '%s' leads to '%s', which does not exist.",
+                           from_file, redirects[from_file])
+
+    stubs = {}
+    for from_file, to_file in redirects.items():
+        # Prepare the source and destination paths.
+        to_path_prefix = '../' * from_file.count('/')
+        from_html_file = from_file.replace(source_suffix, '.html')
+        to_html_file = to_path_prefix + to_file.replace(source_suffix, '.html')
+        stubs[from_html_file] = TEMPLATE % to_html_file
+
+    # Create the redirections.
+    written, removed = write_redirect_stubs(app.builder.outdir, stubs)
+    logger.info(
+        "Redirects: %d written, %d unchanged, %d removed.", written, len(stubs) - written, removed
+    )
+    write_redirect_maps(
+        app.builder.outdir, redirects, source_suffix, app.config.redirects_map_prefix.rstrip('/')
+    )
 
 
 def setup(app):
     app.add_config_value('redirects_dir', 'redirects', 'env')
-    app.connect('builder-inited', generate_redirects)
+    # The path prepended to the URLs of the nginx map, e.g., /documentation/19.0/fr
+    app.add_config_value('redirects_map_prefix', '', '')
+    app.connect('env-before-read-docs', generate_redirects)
 
     return {
         'parallel_read_safe': True,
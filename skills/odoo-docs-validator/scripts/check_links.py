@@ -4,129 +4,462 @@ import sys
 import re
 from pathlib import Path
 import argparse
+import json
+import unicodedata
+from functools import partial
+
+from diagnostics import FORMATS, open_emitter
+from git_changes import GitError, get_changed_paths, get_content_at
+from result_cache import (
+    CACHE_DIR_NAME,
+    ResultCache,
+    content_digest,
+    get_cache_path,
+    rules_version,
+)
+
+# Single-pass scanner extracting, in order of appearance:
+# - targets: .. _target-name:, possibly indented, quoted with backticks or followed by spaces
+# - links: :ref:`label <target>`, :ref:`target`, :doc:`label <path>` or :doc:`path`; the label
+#   may span several lines
+# - resources: .. image:: path, .. figure:: path or .. literalinclude:: path
+# - toctrees: the whole block of a top-level .. toctree:: directive, whose entries are links to
+#   documents; indented toctrees are examples in literal blocks
+# - headings: a title underlined by an adornment; matched with a lookahead so that the title is
+#   scanned for links too
+SCANNER_RE = re.compile(
+    r"^[ \t]*\.\. _`?(?P<target>[^:`\n]+?)`?[ \t]*:"
+    r"|:(?P<role>ref|doc):`(?:[^<`]*<)?(?P<link>[^>`\s]+)>?`"
+    r"|^[ \t]*\.\. (?:image|figure|literalinclude):: (?P<resource>\S+)"
+    r"|^(?P<toctree>\.\. toctree::.*\n(?:(?:[ \t]+.*)?\n)*)"
+    r"|^(?=(?P<heading>[^\s.=\-~*^#\"'+`][^\n]*)\n(?P<adornment>[=\-~*^#\"'+`])(?P=adornment)+[ \t]*$)",
+    re.MULTILINE,
+)
+TOCTREE_ENTRY_RE = re.compile(r"^(?:.*<(.+)>|(.+))$")
+# Inline markup stripped from heading titles before computing their anchor
+INLINE_MARKUP_RE = re.compile(r":[\w-]+:`|[`*|]")
+
+# Results cached by an older version of the rules are discarded.
+RULES_VERSION = rules_version(__file__)
+
+
+def resolve_doc(target, rel_dir):
+    """Resolve a :doc: target (or a resource path) as Sphinx does, relative to the directory of
+    the linking file."""
+    if target.startswith("/"):
+        return target[1:]
+    return os.path.normpath(os.path.join(str(rel_dir), target))
+
+
+def heading_anchor(title):
+    """Return the anchor that docutils generates for a section title."""
+    text = INLINE_MARKUP_RE.sub("", title)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    text = re.sub(r"[^a-z0-9]+", "-", " ".join(text.split()))
+    return re.sub(r"^[-0-9]+|-+$", "", text)
+
+
+def parse_toctree(block, lno, rel_dir):
+    """Return the links to the documents listed in the block of a toctree directive."""
+    links = []
+    for offset, line in enumerate(block.splitlines()[1:], 1):
+        entry = line.strip()
+        if not entry or entry.startswith(":"):  # Blank line or directive option.
+            continue
+        match = TOCTREE_ENTRY_RE.match(entry)
+        target = (match.group(1) or match.group(2)).strip()
+        if target == "self" or "://" in target or any(c in target for c in "*?["):
+            continue  # Not a document, or a glob pattern.
+        links.append([lno + offset, "toctree", target, resolve_doc(target, rel_dir)])
+    return links
+
+
+def scan_content(content, rel_dir):
+    """Extract the targets and headings defined in an RST source, the links it contains and
+    the resource files it uses, in a single pass of SCANNER_RE.
+
+    :param rel_dir: The directory of the source, relative to the documentation root
+    :return: A JSON-serializable record of the targets, headings, links and resources; a
+             heading is a (line number, title, anchor) list, a link is a (line number, role,
+             target, resolved target) list, the role being one of ref, doc and toctree, and a
+             resource is a path relative to the documentation root
+    """
+    targets, headings, links, resources = [], [], [], []
+    lno, pos = 1, 0
+    for match in SCANNER_RE.finditer(content):
+        if match.group("target") is not None:
+            targets.append(match.group("target"))
+            continue
+        if match.group("resource") is not None:
+            resources.append(resolve_doc(match.group("resource"), rel_dir))
+            continue
+
+        lno += content.count("\n", pos, match.start())
+        pos = match.start()
+        if match.group("role") is not None:
+            role, target = match.group("role", "link")
+            resolved = target if role == "ref" else resolve_doc(target, rel_dir)
+            links.append([lno, role, target, resolved])
+        elif match.group("toctree") is not None:
+            links.extend(parse_toctree(match.group("toctree"), lno, rel_dir))
+        else:
+            title = match.group("heading").strip()
+            headings.append([lno, title, heading_anchor(title)])
+    return {"targets": targets, "headings": headings, "links": links, "resources": resources}
+
+
+def parse_file(file_path, root_dir):
+    """Read a file and extract its record with `scan_content`.
+
+    :return: The digest of the file and its record
+    """
+    file_path = Path(file_path)
+    try:
+        rel_dir = file_path.parent.relative_to(Path(root_dir))
+        with open(file_path, "rb") as f:
+            data = f.read()
+        content = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return None, {
+            "targets": [], "headings": [], "links": [], "resources": [], "error": str(e)
+        }
+
+    return content_digest(data), scan_content(content, rel_dir)
+
+
+def check_record(record, all_targets, all_docs):
+    """Check the links of a file record against the known targets and documents.
+
+    :return: The errors, as (line number, message, rule identifier) tuples
+    """
+    if "error" in record:
+        return [(0, f"Error processing file: {record['error']}", "unreadable-file")]
+
+    errors = []
+    for lno, role, target, resolved in record["links"]:
+        if role == "ref":
+            if target not in all_targets:
+                # Skip standard ones or external
+                if not any(target.startswith(x) for x in ["http", "mailto", "std:"]):
+                    errors.append((lno, f"Broken :ref: target '{target}'", "broken-ref"))
+        elif resolved not in all_docs:
+            if role == "toctree":
+                message = f"Broken toctree entry '{target}' (resolved to '{resolved}')"
+            else:
+                message = f"Broken :doc: path '{target}' (resolved to '{resolved}')"
+            errors.append((lno, message, f"broken-{role}"))
+    return errors
 
 
 def collect_targets(root_dir):
     """Scan all RST files to find available targets and documents."""
-    targets = set()
-    docs = set()
+    records, _changed_targets, _changed_docs = load_records(
+        root_dir, ResultCache(None, RULES_VERSION)
+    )
+    targets = {target for record in records.values() for target in record["targets"]}
+    # Headings are recorded too, but they are not targets of :ref: links as long as the
+    # autosectionlabel extension is not enabled.
+    docs = {rel_path[:-4] for rel_path in records}
+    return targets, docs
+
+
+def check_links_in_file(file_path, all_targets, all_docs, root_dir):
+    """Check for broken :ref: and :doc: links in a single file."""
+    _digest, record = parse_file(file_path, root_dir)
+    return check_record(record, all_targets, all_docs)
+
+
+def open_cache(root_dir, enabled=True):
+    """Return the cache of file records of a documentation directory."""
+    cache_path = get_cache_path(root_dir, "check_links.json") if enabled else None
+    return ResultCache(cache_path, RULES_VERSION)
+
+
+def select_changed_files(root_dir, records, rev):
+    """Return the RST files to check after the changes made since a git revision.
+
+    These are the added or modified RST files, the files linking to an RST file that was
+    changed (or to a target it added or removed), and the files using an image or including a
+    file that was changed.
+
+    :param records: The record of every RST file under root_dir, keyed by relative path
+    :return: The set of relative paths (keys of `records`) of the files to check
+    """
+    root_path = Path(root_dir).resolve()
+    toplevel, changed_paths = get_changed_paths(rev, cwd=root_path)
+
+    selected = set()
+    changed_docs, changed_targets, changed_resources = set(), set(), set()
+    for path in changed_paths:
+        try:
+            rel_path = str(path.relative_to(root_path))
+        except ValueError:
+            continue  # Outside of the documentation directory.
+        if not rel_path.endswith(".rst"):
+            changed_resources.add(rel_path)
+            continue
+        changed_docs.add(rel_path[:-4])
+        new_targets, old_targets = set(), set()
+        if rel_path in records:
+            selected.add(rel_path)
+            new_targets.update(records[rel_path]["targets"])
+        old_content = get_content_at(rev, path, toplevel)
+        if old_content:
+            old_targets.update(scan_content(old_content, Path(rel_path).parent)["targets"])
+        changed_targets.update(new_targets ^ old_targets)
+
+    for rel_path, record in records.items():
+        if any(
+            (resolved in changed_targets) if role == "ref" else (resolved in changed_docs)
+            for _lno, role, _target, resolved in record["links"]
+        ) or not changed_resources.isdisjoint(record["resources"]):
+            selected.add(rel_path)
+    return selected
 
-    # Regex for .. _target-name:
-    target_re = re.compile(r"^\.\. _([^:]+):", re.MULTILINE)
 
+def load_records(root_dir, cache):
+    """Return the record of every RST file under root_dir, keyed by relative path, and the
+    targets and documents added or removed since the records were cached.
+
+    Only the files whose content changed are parsed again.
+    """
     root_path = Path(root_dir)
+    records = {}
+    changed_targets, changed_docs = set(), set()
     for rst_file in root_path.rglob("*.rst"):
-        rel_path = rst_file.relative_to(root_path)
-        doc_name = str(rel_path.with_suffix(""))
-        docs.add(doc_name)
+        rel_path = str(rst_file.relative_to(root_path))
+        record = cache.get(rst_file, rel_path)
+        if record is None:
+            previous = cache.previous(rel_path)
+            digest, record = parse_file(rst_file, root_dir)
+            if previous is None:
+                changed_docs.add(rel_path[:-4])
+                changed_targets.update(record["targets"])
+            else:
+                changed_targets.update(set(previous["targets"]) ^ set(record["targets"]))
+            if digest:
+                cache.put(rst_file, record, digest, rel_path)
+        records[rel_path] = record
+
+    for rel_path, previous in cache.prune(records).items():
+        changed_docs.add(rel_path[:-4])
+        changed_targets.update(previous["targets"])
+    return records, changed_targets, changed_docs
+
+
+def build_reference_graph(records):
+    """Build the symbol table and the reference graph of the documentation.
+
+    The symbol table lists the documents, the explicit labels with the document defining them
+    and the heading anchors (as "document#anchor") with their line and title. The graph maps
+    each document to the links it contains ("edges") and to the links pointing to it
+    ("reverse"); a link is a (document, line number, role, target) list, the document being
+    the linked one in "edges" and the linking one in "reverse". Broken links are left out.
+    """
+    docs = sorted(rel_path[:-4] for rel_path in records)
+    labels, headings = {}, {}
+    for rel_path, record in records.items():
+        doc = rel_path[:-4]
+        for target in record["targets"]:
+            labels.setdefault(target, doc)
+        for lno, title, anchor in record.get("headings", []):
+            headings.setdefault(f"{doc}#{anchor}", [doc, lno, title])
+
+    all_docs = set(docs)
+    edges, reverse = {}, {}
+    for rel_path, record in sorted(records.items()):
+        src = rel_path[:-4]
+        for lno, role, target, resolved in record["links"]:
+            dst = labels.get(resolved) if role == "ref" else resolved
+            if dst not in all_docs:
+                continue
+            edges.setdefault(src, []).append([dst, lno, role, target])
+            reverse.setdefault(dst, []).append([src, lno, role, target])
+    return {
+        "symbols": {"docs": docs, "labels": labels, "headings": headings},
+        "edges": edges,
+        "reverse": reverse,
+    }
+
 
+def load_reference_graph(root_dir, records, rebuild, enabled=True):
+    """Return the reference graph of the documentation, from its cache unless `rebuild`.
+
+    The graph is persisted next to the cache of file records, as reference_graph.json.
+    """
+    graph_path = get_cache_path(root_dir, "reference_graph.json") if enabled else None
+    if graph_path and not rebuild:
         try:
-            with open(rst_file, "r", encoding="utf-8") as f:
-                content = f.read()
-                # Find explicit targets
-                for match in target_re.finditer(content):
-                    targets.add(match.group(1))
-                # Find headings as targets (Sphinx creates them automatically)
-                # This is more complex, we'll skip for now to avoid false positives
-        except Exception as e:
-            print(f"Error reading {rst_file}: {e}")
+            with open(graph_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == RULES_VERSION:
+                return data["graph"]
+        except (OSError, ValueError, KeyError):
+            pass
 
-    return targets, docs
+    graph = build_reference_graph(records)
+    if graph_path:
+        tmp_path = graph_path.with_suffix(".tmp")
+        try:
+            graph_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": RULES_VERSION, "graph": graph}, f)
+            os.replace(tmp_path, graph_path)
+        except OSError as e:
+            print(f"Warning: could not write reference graph {graph_path}: {e}")
+    return graph
 
 
-def check_links_in_file(file_path, all_targets, all_docs, root_dir):
-    """Check for broken :ref: and :doc: links in a single file."""
-    errors = []
-    root_path = Path(root_dir)
-    file_path = Path(file_path)
-    file_dir = file_path.parent
+def print_incoming_links(graph, name, root_dir):
+    """Print the links to a document or label, i.e. what breaks if it is removed.
 
-    # Regex for :ref:`label <target>` or :ref:`target`
-    ref_re = re.compile(r":ref:`(?:[^<]*<)?([^>`\s]+)(?:>)?`")
-    # Regex for :doc:`label <path>` or :doc:`path`
-    doc_re = re.compile(r":doc:`(?:[^<]*<)?([^>`\s]+)(?:>)?`")
+    :param name: A label, a document name or the path of an RST file
+    :return: False if `name` is neither a known document nor a known label
+    """
+    labels = graph["symbols"]["labels"]
+    if name in labels:
+        doc, label = labels[name], name
+    else:
+        doc, label = name.removesuffix(".rst"), None
+        rel_path = get_rel_path(name, root_dir)
+        if os.path.exists(name) and rel_path:
+            doc = rel_path.removesuffix(".rst")
+        if doc not in graph["symbols"]["docs"]:
+            return False
 
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            for lno, line in enumerate(lines):
-                # Check refs
-                for match in ref_re.finditer(line):
-                    target = match.group(1)
-                    if target not in all_targets:
-                        # Skip standard ones or external
-                        if not any(
-                            target.startswith(x) for x in ["http", "mailto", "std:"]
-                        ):
-                            errors.append((lno + 1, f"Broken :ref: target '{target}'"))
-
-                # Check docs
-                for match in doc_re.finditer(line):
-                    target = match.group(1)
-                    # Sphinx :doc: resolution logic
-                    if target.startswith("/"):
-                        resolved_doc = target[1:]
-                    else:
-                        # Relative to current file's directory
-                        rel_dir = file_dir.relative_to(root_path)
-                        resolved_doc = os.path.normpath(
-                            os.path.join(str(rel_dir), target)
-                        )
-
-                    if resolved_doc not in all_docs:
-                        errors.append(
-                            (
-                                lno + 1,
-                                f"Broken :doc: path '{target}' (resolved to '{resolved_doc}')",
-                            )
-                        )
-    except Exception as e:
-        errors.append((0, f"Error processing file: {e}"))
+    links = [
+        link for link in graph["reverse"].get(doc, [])
+        if label is None or (link[2] == "ref" and link[3] == label)
+    ]
+    print(f"{len(links)} link(s) to {label or doc}:")
+    for src, lno, role, target in links:
+        print(f"  {Path(root_dir) / src}.rst:{lno} [{role}] {target}")
+    return True
 
-    return errors
+
+def get_rel_path(file_path, root_path):
+    """Return the path of a file relative to the root directory, or None if outside of it."""
+    try:
+        return str(Path(file_path).resolve().relative_to(Path(root_path).resolve()))
+    except ValueError:
+        return None
 
 
 def main():
     parser = argparse.ArgumentParser(description="Odoo Documentation Link Checker")
-    parser.add_argument("path", help="Path to RST file or directory to check")
+    parser.add_argument("path", nargs="?", help="Path to RST file or directory to check")
     parser.add_argument(
         "--root",
         default="content",
         help="Root documentation directory (default: content)",
     )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REV",
+        help="Only check the files changed since the git revision REV, and their dependents",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Check all files instead of replaying the results cached in {CACHE_DIR_NAME}",
+    )
+    parser.add_argument(
+        "--links-to",
+        metavar="NAME",
+        help="List the links to a document (name or RST file) or label instead of checking links",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="Output format: human-readable text, NDJSON or SARIF diagnostics (default: text)",
+    )
 
     args = parser.parse_args()
+    if args.path is None and args.links_to is None:
+        parser.error("the path argument is required unless --links-to is given")
 
     if not os.path.exists(args.root):
         print(f"Error: Root directory '{args.root}' not found.")
         sys.exit(1)
 
-    print(f"Scanning '{args.root}' for targets and documents...")
-    all_targets, all_docs = collect_targets(args.root)
-    print(f"Found {len(all_targets)} targets and {len(all_docs)} documents.")
+    root_path = Path(args.root)
+    cache = open_cache(args.root, enabled=not args.no_cache)
+    # Keep the standard output for the diagnostics.
+    log = print if args.format == "text" else partial(print, file=sys.stderr)
+
+    log(f"Scanning '{args.root}' for targets and documents...")
+    records, changed_targets, changed_docs = load_records(args.root, cache)
+    all_targets = {target for record in records.values() for target in record["targets"]}
+    all_docs = {rel_path[:-4] for rel_path in records}
+    log(f"Found {len(all_targets)} targets and {len(all_docs)} documents.")
+
+    if args.links_to:
+        graph = load_reference_graph(
+            args.root, records, rebuild=cache.modified, enabled=not args.no_cache
+        )
+        cache.save()
+        if not print_incoming_links(graph, args.links_to, args.root):
+            log(f"Error: '{args.links_to}' is neither a document nor a label.")
+            sys.exit(1)
+        return
+
+    # The cached errors of files linking to a target or document that appeared or disappeared
+    # are outdated, wherever the files are.
+    for rel_path, record in records.items():
+        if "errors" in record and any(
+            (resolved in changed_targets) if role == "ref" else (resolved in changed_docs)
+            for _lno, role, _target, resolved in record["links"]
+        ):
+            del record["errors"]
+            cache.modified = True
 
     target_path = Path(args.path)
     if target_path.is_file():
         files = [target_path]
     else:
-        files = list(target_path.rglob("*.rst"))
+        files = sorted(target_path.rglob("*.rst"))
+
+    if args.changed_since:
+        try:
+            selected = select_changed_files(args.root, records, args.changed_since)
+        except GitError as e:
+            log(f"Error: {e}")
+            sys.exit(1)
+        files = [file for file in files if get_rel_path(file, root_path) in selected]
+        log(f"Checking {len(files)} file(s) affected by changes since {args.changed_since}.")
 
     all_success = True
+    emitter = open_emitter(args.format, "check_links")
     for file in files:
-        errors = check_links_in_file(file, all_targets, all_docs, args.root)
+        record = records.get(get_rel_path(file, root_path))
+        if record is None:
+            errors = check_links_in_file(file, all_targets, all_docs, args.root)
+        else:
+            if "errors" not in record:
+                record["errors"] = check_record(record, all_targets, all_docs)
+                cache.modified = True
+            errors = record["errors"]
         if errors:
             all_success = False
-            print(f"Link errors in {file}:")
-            for lno, msg in errors:
-                print(f"  [Line {lno}] {msg}")
+            if emitter:
+                for lno, msg, rule_id in errors:
+                    emitter.emit(file, lno, rule_id, msg)
+                continue
+            log(f"Link errors in {file}:")
+            for lno, msg, _rule_id in errors:
+                log(f"  [Line {lno}] {msg}")
         else:
             # print(f"  [OK] {file}")
             pass
 
+    cache.save()
+    if emitter:
+        emitter.close()
     if all_success:
-        print("✅ No broken :ref: or :doc: links found in the specified path.")
+        log("✅ No broken :ref: or :doc: links found in the specified path.")
     else:
-        print("❌ Found broken links.")
+        log("❌ Found broken links.")
         sys.exit(1)
 
 
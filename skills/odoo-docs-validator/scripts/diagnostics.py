@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Structured diagnostics output shared by the validation scripts, for CI tools that would
+otherwise parse the human-readable reports.
+
+Diagnostics are emitted as they are produced, either as NDJSON (one JSON object per line) or
+as a SARIF 2.1.0 log, whose results can only be read once the log is complete. Output is
+buffered and written in chunks, so that large runs do not pay for one write per diagnostic.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Output formats of the --format option; "text" keeps the human-readable report.
+FORMATS = ("text", "ndjson", "sarif")
+# Number of characters buffered before they are written to the output stream
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+
+class DiagnosticsEmitter:
+    """Emit each diagnostic as a "file:line: message (rule)" text line, as sphinx-lint does,
+    and buffer the output. Subclasses emit the diagnostics in structured formats.
+
+    A fix-it is a dict with the 1-based `line` whose content must be replaced by `text`.
+    """
+
+    def __init__(self, tool, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.tool = tool
+        self.stream = stream or sys.stdout
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.buffered = 0
+        self.count = 0
+        self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        pass
+
+    def emit(self, file, line, rule, message, level="error", fix=None):
+        """Stream a diagnostic on a 1-based line of a file, or on the whole file if line is 0."""
+        self.count += 1
+        self.write(self.format(Path(file).as_posix(), line or 0, rule, message, level, fix))
+
+    def format(self, file, line, rule, message, level, fix):
+        return f"{file}:{line}: {message} ({rule})\n"
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.stream.write("".join(self.chunks))
+            self.chunks, self.buffered = [], 0
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class NdjsonEmitter(DiagnosticsEmitter):
+    """Emit each diagnostic as a JSON object on its own line."""
+
+    def format(self, file, line, rule, message, level, fix):
+        record = {
+            "tool": self.tool,
+            "file": file,
+            "line": line,
+            "rule": rule,
+            "level": level,
+            "message": message,
+        }
+        if fix:
+            record["fix"] = fix
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class SarifEmitter(DiagnosticsEmitter):
+    """Emit the diagnostics as the results of a single-run SARIF log.
+
+    The results are written as they come; the tool description, which lists the rules that
+    were reported, is written after them when the emitter is closed.
+    """
+
+    def start(self):
+        self.rules = {}
+        self.write(
+            f'{{"$schema": "{SARIF_SCHEMA}", "version": "2.1.0", "runs": [{{"results": [\n'
+        )
+
+    def format(self, file, line, rule, message, level, fix):
+        self.rules.setdefault(rule, len(self.rules))
+        location = {"artifactLocation": {"uri": file}}
+        if line:
+            location["region"] = {"startLine": line}
+        result = {
+            "ruleId": rule,
+            "ruleIndex": self.rules[rule],
+            "level": level,
+            "message": {"text": message},
+            "locations": [{"physicalLocation": location}],
+        }
+        if fix:
+            result["fixes"] = [{
+                "artifactChanges": [{
+                    "artifactLocation": {"uri": file},
+                    "replacements": [{
+                        "deletedRegion": {"startLine": fix["line"], "endLine": fix["line"]},
+                        "insertedContent": {"text": fix["text"]},
+                    }],
+                }],
+            }]
+        separator = ",\n" if self.count > 1 else ""
+        return separator + json.dumps(result, ensure_ascii=False)
+
+    def close(self):
+        driver = {"name": self.tool, "rules": [{"id": rule} for rule in self.rules]}
+        self.write(f'\n], "tool": {{"driver": {json.dumps(driver)}}}}}]}}\n')
+        super().close()
+
+
+def open_emitter(output_format, tool, stream=None):
+    """Return the emitter of an output format, or None for the human-readable "text" format."""
+    if output_format == "ndjson":
+        return NdjsonEmitter(tool, stream)
+    if output_format == "sarif":
+        return SarifEmitter(tool, stream)
+    return None
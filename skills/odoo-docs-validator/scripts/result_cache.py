@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of per-file check results, shared by the validation scripts.
+
+Results are keyed on the content hash of the checked file and are only valid for the
+rule-set version they were computed with. The mtime and size of the file are recorded too,
+so that unchanged files are recognized without even being read.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# Directory, next to the documentation directory, holding the caches of the scripts
+CACHE_DIR_NAME = ".odoo-docs-cache"
+
+
+def get_cache_path(root_dir, file_name):
+    """Return the path of a cache file next to a documentation directory.
+
+    Return None, i.e., no cache, if the directory does not exist: with the default `--root`
+    resolved from another working directory, the cache would be written in that directory.
+    """
+    root_dir = Path(root_dir).resolve()
+    return root_dir.parent / CACHE_DIR_NAME / file_name if root_dir.is_dir() else None
+
+
+def content_digest(data):
+    """Return the hash identifying the content (bytes) of a file."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def rules_version(*source_files):
+    """Return a version identifying the rule set implemented by the given source files.
+
+    Any change to the checking code thus invalidates the results computed by its previous
+    version.
+    """
+    digest = hashlib.sha1()
+    for source_file in source_files:
+        digest.update(Path(source_file).read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """A JSON file mapping file keys to their last check result.
+
+    If `cache_path` is None, the cache is disabled: it never hits and is never saved.
+    """
+
+    def __init__(self, cache_path, version):
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.version = version
+        self.entries = {}
+        self.modified = False
+        if self.cache_path:
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == version:
+                    self.entries = data["entries"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+    def get(self, file_path, key=None):
+        """Return the cached result of a file if its content did not change, otherwise None."""
+        entry = self.entries.get(key or str(file_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+            if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return entry["result"]
+            digest = content_digest(Path(file_path).read_bytes())
+        except OSError:
+            return None
+        if entry["digest"] != digest:
+            return None
+        # Same content, touched file: remember the new stat to skip hashing next time.
+        entry["mtime"], entry["size"] = stat.st_mtime_ns, stat.st_size
+        self.modified = True
+        return entry["result"]
+
+    def previous(self, key):
+        """Return the result stored for a key, whether or not it is still valid."""
+        entry = self.entries.get(key)
+        return entry and entry["result"]
+
+    def put(self, file_path, result, digest, key=None):
+        """Store the result computed for a file whose content had the given digest."""
+        if not self.cache_path:
+            return
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        self.entries[key or str(file_path)] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": digest,
+            "result": result,
+        }
+        self.modified = True
+
+    def prune(self, keys):
+        """Forget the entries whose key is not in `keys`, and return their results."""
+        removed = {
+            key: entry["result"] for key, entry in self.entries.items() if key not in keys
+        }
+        for key in removed:
+            del self.entries[key]
+        self.modified = self.modified or bool(removed)
+        return removed
+
+    def save(self):
+        if not (self.cache_path and self.modified):
+            return
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "entries": self.entries}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not write cache {self.cache_path}: {e}")
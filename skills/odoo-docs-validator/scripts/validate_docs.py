@@ -3,8 +3,23 @@ import os
 import sys
 import re
 import argparse
+import io
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
 from pathlib import Path
 
+from check_links import get_rel_path, load_records, open_cache, select_changed_files
+from diagnostics import FORMATS, open_emitter
+from git_changes import GitError
+from result_cache import (
+    CACHE_DIR_NAME,
+    ResultCache,
+    content_digest,
+    get_cache_path,
+    rules_version,
+)
+
 # Constants from Odoo documentation guidelines
 ALLOWED_HEADING_CHARS = ["=", "-", "~", "*", "^"]
 MAIN_HEADING_CHAR = ALLOWED_HEADING_CHARS[0]
@@ -16,234 +31,325 @@ HEADING_DELIMITER_RE = re.compile(
 FORBIDDEN_HEADING_DELIMITER_RE = re.compile(
     "^(" + "|".join(rf"\{char}+" for char in FORBIDDEN_HEADING_CHARS) + ")$"
 )
-MAIN_HEADING_RE = re.compile(
-    rf"^{MAIN_HEADING_CHAR}+\n[^\n]+\n{MAIN_HEADING_CHAR}+$", re.MULTILINE
-)
 
 GIT_CONFLICT_MARKERS = ["<" * 7, ">" * 7]
 
-
-def check_headings(lines, file_path):
-    errors = []
-    h1_count = 0
-    last_delimiter_char_index = -1
-
-    for lno, line in enumerate(lines):
+# Results cached by an older version of the rules are discarded.
+RULES_VERSION = rules_version(__file__)
+
+
+LINKS_AND_IMAGES = ["http://", "https://", ".. image::", ".. figure::"]
+IMAGE_DIRECTIVE_RE = re.compile(r"\.\. (image|figure):: (.*)")
+
+# Rules registered with @rule, run in registration order on every line of a file.
+LINE_RULES = []
+# Rules registered with @rule(at_end=True), run once the last line of a file has been scanned.
+END_RULES = []
+# Rules registered with @fix_rule, run on every line before the other rules when fixing.
+FIX_RULES = []
+
+
+def rule(group, at_end=False):
+    """Register a check as part of a group of rules (headings, formatting, resources)."""
+
+    def register(fn):
+        fn.group = group
+        (END_RULES if at_end else LINE_RULES).append(fn)
+        return fn
+
+    return register
+
+
+def fix_rule(fn):
+    FIX_RULES.append(fn)
+    return fn
+
+
+class FileScan:
+    """The state of a file being scanned, shared by all rules.
+
+    Fix rules rewrite ``lines`` in place, so the rules running after them on the same line,
+    and on the following lines, see the fixed content.
+    """
+
+    def __init__(self, file_path, lines, fix=False):
+        self.file_path = Path(file_path)
+        self.lines = lines
+        self.fix = fix
+        self.media_dir_name = self.file_path.stem
+        self.errors = []
+        self.modified = False
+        # Heading rules state
+        self.h1_count = 0
+        self.last_delimiter_char_index = -1
+
+    def error(self, lno, msg, rule_id, fix=None):
+        """Record an error on a 0-based line number, or on the whole file if lno is None.
+
+        :param rule_id: The identifier of the rule reported in structured output
+        :param fix: The fix-it of the error, as the 1-based line to replace and its new text
+        """
+        self.errors.append((0 if lno is None else lno + 1, msg, rule_id, fix))
+
+    def heading_lno(self, lno):
+        """Return the line number of the heading text of the delimiter at lno, or -1."""
+        lines = self.lines
+        if (
+            lno > 0
+            and lines[lno - 1].strip()
+            and not HEADING_DELIMITER_RE.match(lines[lno - 1].strip())
+        ):
+            return lno - 1
+        elif (
+            lno + 1 < len(lines)
+            and lines[lno + 1].strip()
+            and not HEADING_DELIMITER_RE.match(lines[lno + 1].strip())
+        ):
+            return lno + 1
+        return -1
+
+
+def scan_file(file_path, lines, fix=False, groups=None):
+    """Run the rules over the lines of a file in a single pass.
+
+    :param lines: The lines of the file, rewritten in place if `fix` is set
+    :param fix: Whether to run the fix rules before the checks on each line
+    :param groups: The groups of rules to run; all of them if None
+    :return: The scan, holding the sorted errors and whether the lines were modified
+    """
+    scan = FileScan(file_path, lines, fix)
+    line_rules = [r for r in LINE_RULES if groups is None or r.group in groups]
+    end_rules = [r for r in END_RULES if groups is None or r.group in groups]
+    fix_rules = FIX_RULES if fix else []
+
+    for lno in range(len(lines)):
+        for fixer in fix_rules:
+            fixer(scan, lno, lines[lno])
+        line = lines[lno]
         stripped_line = line.rstrip()
+        for check in line_rules:
+            check(scan, lno, line, stripped_line)
+    for check in end_rules:
+        check(scan)
+
+    scan.errors.sort(key=lambda error: error[:2])
+    return scan
+
+
+@rule("headings")
+def check_heading_delimiter(scan, lno, line, stripped_line):
+    # Check forbidden characters
+    if FORBIDDEN_HEADING_DELIMITER_RE.match(stripped_line):
+        scan.error(
+            lno,
+            f"Illegal use of character {stripped_line[0]} in heading delimiter; use one of {', '.join(ALLOWED_HEADING_CHARS)}",
+            "heading-delimiters-characters",
+        )
+        return
+
+    if not HEADING_DELIMITER_RE.match(stripped_line):
+        return
+
+    lines = scan.lines
+    delimiter_char = stripped_line[0]
+    delimiter_char_index = ALLOWED_HEADING_CHARS.index(delimiter_char)
+
+    # Check H1 (overlined and underlined with =)
+    if delimiter_char == MAIN_HEADING_CHAR:
+        # Is it an overline?
+        if lno + 2 < len(lines):
+            underline = lines[lno + 2].rstrip()
+            if scan.fix and HEADING_DELIMITER_RE.match(underline):
+                # The underline is only fixed when its line is scanned, after this overline.
+                heading_lno = scan.heading_lno(lno + 2)
+                if heading_lno != -1:
+                    underline = underline[0] * len(lines[heading_lno].rstrip())
+            if underline == stripped_line:
+                scan.h1_count += 1
+
+    # Check order
+    last_delimiter_char_index = scan.last_delimiter_char_index
+    if delimiter_char_index > last_delimiter_char_index + 1:
+        last_delimiter_char = (
+            ALLOWED_HEADING_CHARS[last_delimiter_char_index]
+            if last_delimiter_char_index != -1
+            else "None"
+        )
+        scan.error(
+            lno,
+            f"Heading delimiter {delimiter_char} not allowed after {last_delimiter_char}; follow order: {', '.join(ALLOWED_HEADING_CHARS)}",
+            "heading-delimiters-order",
+        )
 
-        # Check forbidden characters
-        if FORBIDDEN_HEADING_DELIMITER_RE.match(stripped_line):
-            errors.append(
-                (
-                    lno + 1,
-                    f"Illegal use of character {stripped_line[0]} in heading delimiter; use one of {', '.join(ALLOWED_HEADING_CHARS)}",
-                )
+    scan.last_delimiter_char_index = max(last_delimiter_char_index, delimiter_char_index)
+
+    # Check length
+    heading_lno = scan.heading_lno(lno)
+    if heading_lno != -1:
+        heading_len = len(lines[heading_lno].rstrip())
+        if len(stripped_line) != heading_len:
+            scan.error(
+                lno,
+                f"Heading delimiter length ({len(stripped_line)}) must match heading text length ({heading_len})",
+                "heading-delimiters-length",
+                {"line": lno + 1, "text": delimiter_char * heading_len},
             )
-            continue
-
-        if HEADING_DELIMITER_RE.match(stripped_line):
-            delimiter_char = stripped_line[0]
-            delimiter_char_index = ALLOWED_HEADING_CHARS.index(delimiter_char)
-
-            # Check H1 (overlined and underlined with =)
-            if delimiter_char == MAIN_HEADING_CHAR:
-                # Is it an overline?
-                if lno + 2 < len(lines) and lines[lno + 2].rstrip() == stripped_line:
-                    h1_count += 1
-
-            # Check order
-            if delimiter_char_index > last_delimiter_char_index + 1:
-                last_delimiter_char = (
-                    ALLOWED_HEADING_CHARS[last_delimiter_char_index]
-                    if last_delimiter_char_index != -1
-                    else "None"
-                )
-                errors.append(
-                    (
-                        lno + 1,
-                        f"Heading delimiter {delimiter_char} not allowed after {last_delimiter_char}; follow order: {', '.join(ALLOWED_HEADING_CHARS)}",
-                    )
-                )
 
-            last_delimiter_char_index = max(
-                last_delimiter_char_index, delimiter_char_index
-            )
 
-            # Check length
-            heading_lno = -1
-            if (
-                lno > 0
-                and lines[lno - 1].strip()
-                and not HEADING_DELIMITER_RE.match(lines[lno - 1].strip())
-            ):
-                heading_lno = lno - 1
-            elif (
-                lno + 1 < len(lines)
-                and lines[lno + 1].strip()
-                and not HEADING_DELIMITER_RE.match(lines[lno + 1].strip())
-            ):
-                heading_lno = lno + 1
-
-            if heading_lno != -1:
-                if len(stripped_line) != len(lines[heading_lno].rstrip()):
-                    errors.append(
-                        (
-                            lno + 1,
-                            f"Heading delimiter length ({len(stripped_line)}) must match heading text length ({len(lines[heading_lno].rstrip())})",
-                        )
-                    )
-
-    if h1_count != 1:
-        errors.append(
-            (0, f"Document must have exactly one H1 heading (found {h1_count})")
+@rule("headings", at_end=True)
+def check_h1_count(scan):
+    if scan.h1_count != 1:
+        scan.error(
+            None,
+            f"Document must have exactly one H1 heading (found {scan.h1_count})",
+            "one-main-heading",
         )
 
-    return errors
 
+@rule("formatting")
+def check_line_format(scan, lno, line, stripped_line):
+    # Line length
+    if len(stripped_line) > 100:
+        if not any(x in line for x in LINKS_AND_IMAGES):
+            scan.error(
+                lno, f"Line exceeds 100 characters ({len(stripped_line)} chars)", "line-too-long"
+            )
 
-def check_formatting(lines):
-    errors = []
-    for lno, line in enumerate(lines):
-        # Line length
-        if len(line.rstrip()) > 100:
-            if not any(
-                x in line for x in ["http://", "https://", ".. image::", ".. figure::"]
-            ):
-                errors.append(
-                    (
-                        lno + 1,
-                        f"Line exceeds 100 characters ({len(line.rstrip())} chars)",
-                    )
+    # Conflict markers
+    if any(marker in line for marker in GIT_CONFLICT_MARKERS):
+        scan.error(lno, "Git conflict markers found", "git-conflict-markers")
+
+    # Tabs
+    if "\t" in line:
+        scan.error(lno, "Use spaces, not tabs", "horizontal-tab")
+
+
+@rule("resources")
+def check_image(scan, lno, line, stripped_line):
+    if ".. " not in line:  # Cheap pre-filter before the regex.
+        return
+    img_match = IMAGE_DIRECTIVE_RE.search(line)
+    if not img_match:
+        return
+
+    lines = scan.lines
+    img_path_str = img_match.group(2).strip()
+
+    # Check alt tag
+    has_alt = False
+    for i in range(1, 5):
+        if lno + i < len(lines):
+            if ":alt:" in lines[lno + i]:
+                has_alt = True
+                break
+            if lines[lno + i].strip() == "" or not lines[lno + i].startswith(
+                " "
+            ):  # End of block
+                break
+    if not has_alt:
+        scan.error(lno, f"Image '{img_path_str}' missing :alt: tag", "image-alt")
+
+    # Check path/folder convention
+    if "/" in img_path_str:
+        path_parts = img_path_str.split("/")
+        if path_parts[0] != scan.media_dir_name:
+            if path_parts[0] not in [
+                "..",
+                "media",
+            ]:  # Some exceptions exist but generally it should be same name
+                scan.error(
+                    lno,
+                    f"Image '{img_path_str}' should be in folder '{scan.media_dir_name}'",
+                    "image-folder",
                 )
 
-        # Conflict markers
-        if any(marker in line for marker in GIT_CONFLICT_MARKERS):
-            errors.append((lno + 1, "Git conflict markers found"))
+    # Check naming (no underscores)
+    img_name = img_path_str.split("/")[-1]
+    if "_" in img_name:
+        scan.error(
+            lno,
+            f"Image name '{img_name}' should use hyphens, not underscores",
+            "resource-file-name",
+        )
+
+
+@fix_rule
+def fix_trailing_whitespace(scan, lno, line):
+    if line.endswith(" \n") or line.endswith("\t\n"):
+        scan.lines[lno] = line.rstrip() + "\n"
+        scan.modified = True
+
+
+@fix_rule
+def fix_heading_delimiter_length(scan, lno, line):
+    stripped = line.rstrip()
+    if HEADING_DELIMITER_RE.match(stripped):
+        heading_lno = scan.heading_lno(lno)
+        if heading_lno != -1:
+            target_len = len(scan.lines[heading_lno].rstrip())
+            if len(stripped) != target_len:
+                scan.lines[lno] = stripped[0] * target_len + "\n"
+                scan.modified = True
+
+
+def check_headings(lines, file_path):
+    return scan_file(file_path, lines, groups={"headings"}).errors
 
-        # Tabs
-        if "\t" in line:
-            errors.append((lno + 1, "Use spaces, not tabs"))
 
-    return errors
+def check_formatting(lines):
+    return scan_file("", lines, groups={"formatting"}).errors
 
 
 def check_resources(lines, file_path):
-    errors = []
-    file_dir = Path(file_path).parent
-    media_dir_name = Path(file_path).stem
-    media_dir = file_dir / media_dir_name
-
-    for lno, line in enumerate(lines):
-        # Image checks
-        img_match = re.search(r"\.\. (image|figure):: (.*)", line)
-        if img_match:
-            img_path_str = img_match.group(2).strip()
-
-            # Check alt tag
-            has_alt = False
-            for i in range(1, 5):
-                if lno + i < len(lines):
-                    if ":alt:" in lines[lno + i]:
-                        has_alt = True
-                        break
-                    if lines[lno + i].strip() == "" or not lines[lno + i].startswith(
-                        " "
-                    ):  # End of block
-                        break
-            if not has_alt:
-                errors.append((lno + 1, f"Image '{img_path_str}' missing :alt: tag"))
-
-            # Check path/folder convention
-            if "/" in img_path_str:
-                path_parts = img_path_str.split("/")
-                if path_parts[0] != media_dir_name:
-                    if path_parts[0] not in [
-                        "..",
-                        "media",
-                    ]:  # Some exceptions exist but generally it should be same name
-                        errors.append(
-                            (
-                                lno + 1,
-                                f"Image '{img_path_str}' should be in folder '{media_dir_name}'",
-                            )
-                        )
-
-            # Check naming (no underscores)
-            img_name = img_path_str.split("/")[-1]
-            if "_" in img_name:
-                errors.append(
-                    (
-                        lno + 1,
-                        f"Image name '{img_name}' should use hyphens, not underscores",
-                    )
-                )
+    return scan_file(file_path, lines, groups={"resources"}).errors
+
 
-    return errors
+def write_lines(file_path, lines):
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
 
 
 def fix_file(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         lines = f.readlines()
 
-    new_lines = []
-    modified = False
-
-    for lno, line in enumerate(lines):
-        stripped = line.rstrip()
-
-        # Fix trailing whitespace
-        if line.endswith(" \n") or line.endswith("\t\n"):
-            line = stripped + "\n"
-            modified = True
-
-        # Fix heading delimiter length
-        if HEADING_DELIMITER_RE.match(stripped):
-            heading_lno = -1
-            if (
-                lno > 0
-                and lines[lno - 1].strip()
-                and not HEADING_DELIMITER_RE.match(lines[lno - 1].strip())
-            ):
-                heading_lno = lno - 1
-            elif (
-                lno + 1 < len(lines)
-                and lines[lno + 1].strip()
-                and not HEADING_DELIMITER_RE.match(lines[lno + 1].strip())
-            ):
-                heading_lno = lno + 1
-
-            if heading_lno != -1:
-                target_len = len(lines[heading_lno].rstrip())
-                if len(stripped) != target_len:
-                    line = stripped[0] * target_len + "\n"
-                    modified = True
-
-        new_lines.append(line)
-
-    if modified:
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
-        print(f"  [FIXED] {file_path}")
-    else:
-        # print(f"  [UNCHANGED] {file_path}")
-        pass
+    scan = scan_file(file_path, lines, fix=True, groups=())
+    if scan.modified:
+        write_lines(file_path, lines)
 
+    return scan.modified
 
-def validate_file(file_path, args):
-    if args.fix:
-        fix_file(file_path)
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+def check_file(file_path, fix=False):
+    """Fix a file if requested and run all checks on it, reading it only once and scanning
+    its lines in a single pass. Safe to run in a worker process.
+
+    :return: Whether the file was fixed, its errors and the digest of its final content
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8").readlines()
+
+    scan = scan_file(file_path, lines, fix=fix)
+    if scan.modified:
+        write_lines(file_path, lines)
+        data = "".join(lines).encode("utf-8")
 
-    errors = []
-    errors.extend(check_headings(lines, file_path))
-    errors.extend(check_formatting(lines))
-    errors.extend(check_resources(lines, file_path))
+    return scan.modified, scan.errors, content_digest(data)
+
+
+def report_file(file_path, fixed, errors, emitter=None):
+    if emitter:
+        for lno, msg, rule_id, fix in errors:
+            emitter.emit(file_path, lno, rule_id, msg, fix=fix)
+        return not errors
+
+    if fixed:
+        print(f"  [FIXED] {file_path}")
 
     if errors:
         print(f"Errors in {file_path}:")
-        for lno, msg in sorted(errors):
+        for lno, msg, _rule_id, _fix in errors:
             loc = f"Line {lno}" if lno > 0 else "File"
             print(f"  [{loc}] {msg}")
         return False
@@ -252,6 +358,28 @@ def validate_file(file_path, args):
         return True
 
 
+def validate_file(file_path, args):
+    fixed, errors, _digest = check_file(file_path, args.fix)
+    return report_file(file_path, fixed, errors)
+
+
+def open_results_cache(root_dir, enabled=True):
+    """Return the cache of check results, next to a documentation directory."""
+    cache_path = get_cache_path(root_dir, "validate_docs.json") if enabled else None
+    return ResultCache(cache_path, RULES_VERSION)
+
+
+def get_cached_result(cache, file_path, fix):
+    """Return the cached errors of a file, or None if it must be checked again.
+
+    With --fix, only results known to be stable under the fix rules can be replayed.
+    """
+    result = cache.get(file_path, str(Path(file_path).resolve()))
+    if result is None or (fix and not result["after_fix"]):
+        return None
+    return [tuple(error) for error in result["errors"]]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Odoo Documentation Validator")
     parser.add_argument("path", help="Path to RST file or directory")
@@ -261,6 +389,35 @@ def main():
     parser.add_argument(
         "--recursive", "-r", action="store_true", help="Recursive validation"
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes (default: 1; 0 for one per CPU)",
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REV",
+        help="Only validate the files changed since the git revision REV, and their dependents",
+    )
+    parser.add_argument(
+        "--root",
+        default="content",
+        help="Root documentation directory, to find dependents with --changed-since and next to"
+        " which results are cached (default: content)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Check all files instead of replaying the results cached in {CACHE_DIR_NAME}",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="Output format: human-readable text, NDJSON or SARIF diagnostics (default: text)",
+    )
 
     args = parser.parse_args()
 
@@ -274,12 +431,59 @@ def main():
         files.append(path)
     else:
         pattern = "**/*.rst" if args.recursive else "*.rst"
-        files.extend(path.glob(pattern))
-
-    all_success = True
-    for file in files:
-        if not validate_file(file, args):
-            all_success = False
+        files.extend(sorted(path.glob(pattern)))
+
+    if args.changed_since:
+        if not os.path.exists(args.root):
+            print(f"Error: Root directory '{args.root}' not found.")
+            sys.exit(1)
+        links_cache = open_cache(args.root, enabled=not args.no_cache)
+        records, _changed_targets, _changed_docs = load_records(args.root, links_cache)
+        links_cache.save()
+        try:
+            selected = select_changed_files(args.root, records, args.changed_since)
+        except GitError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        files = [file for file in files if get_rel_path(file, args.root) in selected]
+
+    cache = open_results_cache(args.root, enabled=not args.no_cache)
+    cached_results = {file: get_cached_result(cache, file, args.fix) for file in files}
+    stale_files = [file for file in files if cached_results[file] is None]
+
+    with ExitStack() as stack:
+        if args.jobs != 1 and len(stale_files) > 1:
+            workers = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            checked = executor.map(
+                check_file,
+                stale_files,
+                repeat(args.fix),
+                chunksize=max(1, len(stale_files) // (workers * 4)),
+            )
+        else:
+            checked = map(check_file, stale_files, repeat(args.fix))
+
+        # Results are reported in the order of `files`, each as soon as it is available.
+        all_success = True
+        emitter = open_emitter(args.format, "validate_docs")
+        for file in files:
+            if cached_results[file] is not None:
+                fixed, errors = False, cached_results[file]
+            else:
+                fixed, errors, digest = next(checked)
+                # `after_fix` tells whether the errors were computed on content fixed by --fix.
+                cache.put(
+                    file,
+                    {"errors": errors, "after_fix": args.fix},
+                    digest,
+                    str(Path(file).resolve()),
+                )
+            if not report_file(file, fixed, errors, emitter=emitter):
+                all_success = False
+        if emitter:
+            emitter.close()
+    cache.save()
 
     sys.exit(0 if all_success else 1)
 
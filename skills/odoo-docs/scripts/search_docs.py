@@ -4,14 +4,48 @@ Utility script for searching and exploring Odoo documentation structure.
 This script helps locate relevant documentation files based on keywords or file paths.
 """
 
+import json
+import math
 import os
+import pickle
+import re
+import signal
+import socket
+import socketserver
 import sys
+import time
+from array import array
+from bisect import bisect_right
 from pathlib import Path
-from typing import List, Dict, Union
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 # Default documentation path relative to project root
 DEFAULT_DOC_PATH = "content"
 
+# Directory, next to the documentation directory, holding the persistent search index
+INDEX_DIR_NAME = ".odoo-docs-cache"
+# Bump whenever the on-disk layout of the index changes to force a full rebuild
+INDEX_VERSION = 2
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+WORD_RE = re.compile(r"^\w+$")
+# An RST section title adornment: a line made of a single repeated punctuation character
+SECTION_ADORNMENT_RE = re.compile(r"^([=\-~*^#\"'+`:.])\1{2,}\s*$")
+
+# Minimum delay, in seconds, between two checks of the files on disk by the search server
+SERVER_REFRESH_INTERVAL = 2.0
+# Timeout, in seconds, of a single exchange between the client and the search server
+SERVER_TIMEOUT = 5.0
+
+# BM25 ranking parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# A section record: (heading, first line, last line, position of its first term)
+Section = Tuple[str, int, int, int]
+# A ranked hit: (file path, heading, (first line, last line), score)
+RankedHit = Tuple[str, str, Tuple[int, int], float]
+
 
 def find_files_by_keyword(
     keyword: str, doc_path: Union[str, Path, None] = None
@@ -47,14 +81,18 @@ def find_files_by_keyword(
 
 
 def find_files_by_content(
-    keyword: str, doc_path: Union[str, Path, None] = None
+    keyword: str, doc_path: Union[str, Path, None] = None, use_index: bool = True
 ) -> List[str]:
     """
     Find documentation files containing a specific keyword in their content.
 
+    The persistent content index is used when possible; the files are only scanned
+    directly when the keyword has no word characters or when use_index is False.
+
     Args:
         keyword: The keyword to search for
         doc_path: Path to documentation directory (defaults to DEFAULT_DOC_PATH)
+        use_index: Whether to answer the query from the content index
 
     Returns:
         List of matching file paths
@@ -68,6 +106,11 @@ def find_files_by_content(
         print(f"Error: Documentation path not found: {doc_path}")
         return []
 
+    if use_index:
+        matches = ContentIndex.open(doc_path).search(keyword)
+        if matches is not None:
+            return matches
+
     matches = []
     for rst_file in doc_path.rglob("*.rst"):
         if search_in_file(keyword, rst_file):
@@ -134,6 +177,408 @@ def search_in_file(keyword: str, file_path: Union[str, Path]) -> bool:
         return False
 
 
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lower-cased terms, as stored in the content index. Terms are
+    either runs of word characters or single punctuation marks.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List of terms, in order of appearance
+    """
+    return TOKEN_RE.findall(text.lower())
+
+
+def split_sections(lines: List[str], title: str) -> List[Tuple[str, int, int]]:
+    """
+    Split the lines of an RST document into heading-delimited sections.
+
+    Any content preceding the first heading (labels, metadata) belongs to the first section.
+
+    Args:
+        lines: The lines of the document
+        title: The heading to use if the document has no heading at all
+
+    Returns:
+        List of (heading, first line index, end line index) tuples, the end being exclusive
+    """
+    starts = []
+    for lno in range(len(lines) - 1):
+        text = lines[lno].strip()
+        if (
+            text
+            and not lines[lno][0].isspace()
+            and not SECTION_ADORNMENT_RE.match(text)
+            and SECTION_ADORNMENT_RE.match(lines[lno + 1])
+        ):
+            overlined = lno > 0 and lines[lno - 1].rstrip() == lines[lno + 1].rstrip()
+            starts.append((text, lno - 1 if overlined else lno))
+
+    if not starts:
+        return [(title, 0, len(lines))]
+    sections = []
+    for i, (heading, start) in enumerate(starts):
+        end = starts[i + 1][1] if i + 1 < len(starts) else len(lines)
+        sections.append((heading, 0 if i == 0 else start, end))
+    return sections
+
+
+def get_index_path(doc_path: Union[str, Path]) -> Path:
+    """
+    Get the location of the content index of a documentation directory.
+
+    Args:
+        doc_path: Path to documentation directory
+
+    Returns:
+        Path to the index file, in INDEX_DIR_NAME next to the documentation directory
+    """
+    doc_path = Path(doc_path).resolve()
+    return doc_path.parent / INDEX_DIR_NAME / f"{doc_path.name}.index"
+
+
+class ContentIndex:
+    """
+    Persistent inverted index mapping each term of the documentation to the files and
+    positions at which it appears.
+
+    The postings of a term are packed in a single unsigned int array made of consecutive
+    ``doc_id, count, position_1, ..., position_count`` blocks, and stored as raw bytes so
+    that loading the index does not materialize one object per occurrence. Each indexed
+    file is tracked with its mtime and size so that the index is updated incrementally:
+    only added, modified and deleted files are (re)processed.
+
+    Each file also records its heading-delimited sections, and the number of files and
+    sections containing each term is kept up to date, which is all BM25 ranking needs
+    besides the postings themselves.
+    """
+
+    def __init__(self, doc_path: Union[str, Path]):
+        self.doc_path = Path(doc_path)
+        self.index_path = get_index_path(doc_path)
+        # relative path -> (doc_id, mtime_ns, size, newline-separated distinct terms,
+        #                   number of terms, sections)
+        self.docs: Dict[str, Tuple[int, int, int, str, int, Tuple[Section, ...]]] = {}
+        # term -> packed postings, either as bytes (as loaded) or as an array (once modified)
+        self.postings: Dict[str, Union[bytes, array]] = {}
+        # term -> (number of files containing it, number of sections containing it)
+        self.term_stats: Dict[str, Tuple[int, int]] = {}
+        self.next_doc_id = 0
+
+    @classmethod
+    def open(cls, doc_path: Union[str, Path], refresh: bool = True) -> "ContentIndex":
+        """
+        Load the index of a documentation directory, building it if it does not exist.
+
+        Args:
+            doc_path: Path to documentation directory
+            refresh: Whether to bring the index up to date with the files on disk
+
+        Returns:
+            The loaded index
+        """
+        index = cls(doc_path)
+        index._load()
+        if refresh and index.refresh():
+            index.save()
+        return index
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return  # Stale layout; rebuild from scratch.
+        self.docs = data["docs"]
+        self.postings = data["postings"]
+        self.term_stats = data["term_stats"]
+        self.next_doc_id = data["next_doc_id"]
+
+    def save(self) -> None:
+        """Write the index to disk atomically; silently give up if the location is read-only."""
+        data = {
+            "version": INDEX_VERSION,
+            "docs": self.docs,
+            "postings": {
+                term: packed if isinstance(packed, bytes) else packed.tobytes()
+                for term, packed in self.postings.items()
+            },
+            "term_stats": self.term_stats,
+            "next_doc_id": self.next_doc_id,
+        }
+        tmp_path = self.index_path.with_suffix(".tmp")
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Warning: could not write search index {self.index_path}: {e}")
+
+    def _scan_sources(self) -> Dict[str, Tuple[int, int]]:
+        """Return the mtime and size of every RST file, keyed by path relative to doc_path."""
+        sources = {}
+        stack = [self.doc_path]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".rst"):
+                        stat = entry.stat()
+                        rel_path = os.path.relpath(entry.path, self.doc_path)
+                        sources[rel_path] = (stat.st_mtime_ns, stat.st_size)
+        return sources
+
+    def refresh(self) -> bool:
+        """
+        Synchronize the index with the RST files currently on disk.
+
+        Returns:
+            True if the index was modified, False if it was already up to date
+        """
+        sources = self._scan_sources()
+        removed = {
+            rel_path
+            for rel_path, (_doc_id, mtime, size, *_rest) in self.docs.items()
+            if sources.get(rel_path) != (mtime, size)
+        }
+        added = [rel_path for rel_path in sources if rel_path not in self.docs or rel_path in removed]
+        for rel_path in removed:
+            self._remove_document(rel_path)
+        for rel_path in sorted(added):
+            self._add_document(rel_path, *sources[rel_path])
+        return bool(removed or added)
+
+    def _get_array(self, term: str) -> array:
+        packed = self.postings.get(term)
+        if packed is None:
+            packed = self.postings[term] = array("I")
+        elif isinstance(packed, bytes):
+            packed = self.postings[term] = array("I", packed)
+        return packed
+
+    def _add_document(self, rel_path: str, mtime: int, size: int) -> None:
+        try:
+            with open(self.doc_path / rel_path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            lines = []
+
+        positions: Dict[str, List[int]] = {}
+        section_counts: Dict[str, int] = {}
+        sections = []
+        position = 0
+        for heading, start, end in split_sections(lines, Path(rel_path).stem):
+            sections.append((heading, start + 1, end, position))
+            terms = tokenize("\n".join(lines[start:end]))
+            for term in terms:
+                positions.setdefault(term, []).append(position)
+                position += 1
+            for term in set(terms):
+                section_counts[term] = section_counts.get(term, 0) + 1
+
+        doc_id = self.next_doc_id
+        self.next_doc_id += 1
+        for term, term_positions in positions.items():
+            packed = self._get_array(term)
+            packed.append(doc_id)
+            packed.append(len(term_positions))
+            packed.extend(term_positions)
+            doc_count, section_count = self.term_stats.get(term, (0, 0))
+            self.term_stats[term] = (doc_count + 1, section_count + section_counts[term])
+        self.docs[rel_path] = (
+            doc_id, mtime, size, "\n".join(positions), position, tuple(sections)
+        )
+
+    def _remove_document(self, rel_path: str) -> None:
+        doc_id, _mtime, _size, terms, _length, sections = self.docs.pop(rel_path)
+        section_starts = [section[3] for section in sections]
+        for term in filter(None, terms.split("\n")):
+            packed = self._get_array(term)
+            kept = array("I")
+            section_count = 0
+            i = 0
+            while i < len(packed):
+                count = packed[i + 1]
+                if packed[i] != doc_id:
+                    kept.extend(packed[i:i + 2 + count])
+                else:
+                    section_count = len({
+                        bisect_right(section_starts, position)
+                        for position in packed[i + 2:i + 2 + count]
+                    })
+                i += 2 + count
+            if kept:
+                self.postings[term] = kept
+                doc_count, total_section_count = self.term_stats[term]
+                self.term_stats[term] = (doc_count - 1, total_section_count - section_count)
+            else:
+                del self.postings[term]
+                del self.term_stats[term]
+
+    def _iter_postings(self, term: str) -> Iterator[Tuple[int, array]]:
+        """Yield the (doc_id, positions) pairs of a term."""
+        packed = self.postings.get(term)
+        if packed is None:
+            return
+        if isinstance(packed, bytes):
+            packed = array("I", packed)
+        i = 0
+        while i < len(packed):
+            count = packed[i + 1]
+            yield packed[i], packed[i + 2:i + 2 + count]
+            i += 2 + count
+
+    def _positions(self, terms: List[str]) -> Dict[int, Set[int]]:
+        """Return the positions of any of the given terms, keyed by doc_id."""
+        positions: Dict[int, Set[int]] = {}
+        for term in terms:
+            for doc_id, term_positions in self._iter_postings(term):
+                positions.setdefault(doc_id, set()).update(term_positions)
+        return positions
+
+    def search(self, keyword: str) -> Optional[List[str]]:
+        """
+        Find the files whose content contains a keyword, ignoring case.
+
+        A single-word keyword matches any term containing it, like a substring search. A
+        multi-word keyword matches consecutive terms, the first one ending with the first
+        word and the last one starting with the last word. Punctuation marks are indexed
+        as terms of their own, but the amount and kind of whitespace are not significant.
+
+        Args:
+            keyword: The keyword to search for
+
+        Returns:
+            Sorted list of matching file paths, relative to doc_path, or None if the keyword
+            contains no word characters and cannot be answered from the index
+        """
+        words = tokenize(keyword)
+        if not words:
+            return None
+
+        if len(words) == 1:
+            slots = [[term for term in self.postings if words[0] in term]]
+        else:
+            slots = [[term for term in self.postings if term.endswith(words[0])]]
+            slots += [[word] for word in words[1:-1]]
+            slots.append([term for term in self.postings if term.startswith(words[-1])])
+
+        slot_positions = [self._positions(terms) for terms in slots]
+        doc_ids = set(slot_positions[0]).intersection(*slot_positions[1:])
+        if len(slots) > 1:
+            doc_ids = {
+                doc_id
+                for doc_id in doc_ids
+                if any(
+                    all(start + offset in positions[doc_id]
+                        for offset, positions in enumerate(slot_positions[1:], 1))
+                    for start in slot_positions[0][doc_id]
+                )
+            }
+
+        return sorted(
+            rel_path for rel_path, (doc_id, *_rest) in self.docs.items() if doc_id in doc_ids
+        )
+
+    def rank(self, query: str, top_k: int = 10, by_document: bool = False) -> List[RankedHit]:
+        """
+        Rank the sections (or whole files) of the documentation against a query with BM25.
+
+        Only the words of the query are taken into account; punctuation is ignored.
+
+        Args:
+            query: The words to search for
+            top_k: The maximum number of hits to return
+            by_document: Whether to score whole files instead of individual sections
+
+        Returns:
+            List of (file path, heading, (first line, last line), score) tuples, best first
+        """
+        words = [word for word in dict.fromkeys(tokenize(query)) if WORD_RE.match(word)]
+        if not words or not self.docs:
+            return []
+
+        docs_by_id = {record[0]: (rel_path, record) for rel_path, record in self.docs.items()}
+        total_length = sum(record[4] for record in self.docs.values())
+        if by_document:
+            unit_count = len(self.docs)
+        else:
+            unit_count = sum(len(record[5]) for record in self.docs.values())
+        average_length = max(total_length / unit_count, 1.0)
+
+        scores: Dict[Tuple[int, int], float] = {}
+        for word in words:
+            if word not in self.term_stats:
+                continue
+            frequency = self.term_stats[word][0 if by_document else 1]
+            idf = math.log(1 + (unit_count - frequency + 0.5) / (frequency + 0.5))
+            for doc_id, positions in self._iter_postings(word):
+                _rel_path, (*_rest, doc_length, sections) = docs_by_id[doc_id]
+                if by_document:
+                    term_counts = {0: (len(positions), doc_length)}
+                else:
+                    section_starts = [section[3] for section in sections]
+                    term_counts = {}
+                    for position in positions:
+                        index = bisect_right(section_starts, position) - 1
+                        count, length = term_counts.get(index, (0, 0))
+                        if not length:
+                            length = (
+                                section_starts[index + 1] if index + 1 < len(sections)
+                                else doc_length
+                            ) - section_starts[index]
+                        term_counts[index] = (count + 1, length)
+                for index, (count, length) in term_counts.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    key = (doc_id, index)
+                    scores[key] = scores.get(key, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+
+        hits = []
+        for (doc_id, index), score in sorted(scores.items(), key=lambda item: -item[1])[:top_k]:
+            rel_path, (*_rest, sections) = docs_by_id[doc_id]
+            heading, first_line, last_line, _position = sections[index]
+            if by_document:
+                last_line = sections[-1][2]
+            hits.append((rel_path, heading, (first_line, last_line), round(score, 4)))
+        return hits
+
+
+def rank_sections(
+    query: str,
+    doc_path: Union[str, Path, None] = None,
+    top_k: int = 10,
+    by_document: bool = False,
+) -> List[RankedHit]:
+    """
+    Find the documentation sections most relevant to a query, ranked with BM25.
+
+    Args:
+        query: The words to search for
+        doc_path: Path to documentation directory (defaults to DEFAULT_DOC_PATH)
+        top_k: The maximum number of hits to return
+        by_document: Whether to score whole files instead of individual sections
+
+    Returns:
+        List of (file path, heading, (first line, last line), score) tuples, best first
+    """
+    if doc_path is None:
+        doc_path = Path(DEFAULT_DOC_PATH)
+    else:
+        doc_path = Path(doc_path)
+
+    if not doc_path.exists():
+        print(f"Error: Documentation path not found: {doc_path}")
+        return []
+
+    return ContentIndex.open(doc_path).rank(query, top_k, by_document)
+
+
 def get_main_sections(doc_path: Union[str, Path, None] = None) -> List[str]:
     """
     Get the main documentation sections (top-level RST files).
@@ -157,6 +602,206 @@ def get_main_sections(doc_path: Union[str, Path, None] = None) -> List[str]:
     return main_files
 
 
+def get_socket_path(doc_path: Union[str, Path]) -> Path:
+    """
+    Get the location of the Unix socket of the search server of a documentation directory.
+
+    Args:
+        doc_path: Path to documentation directory
+
+    Returns:
+        Path to the socket, next to the content index
+    """
+    return get_index_path(doc_path).with_suffix(".sock")
+
+
+class SearchServer(socketserver.UnixStreamServer):
+    """
+    Resident search server keeping the content index of a documentation directory in memory.
+
+    Clients connect to the server's Unix socket, send a single JSON request line of the form
+    ``{"command": ..., "params": {...}}`` and receive a single JSON response line holding
+    either a ``result`` or an ``error`` key. The index is checked against the files on disk
+    at most once every SERVER_REFRESH_INTERVAL seconds.
+    """
+
+    def __init__(self, doc_path: Union[str, Path]):
+        self.doc_path = Path(doc_path)
+        self.socket_path = get_socket_path(doc_path)
+        if self.socket_path.exists():
+            if query_server("ping", {}, doc_path) is not None:
+                raise OSError(f"A search server is already listening on {self.socket_path}")
+            self.socket_path.unlink()  # Left behind by a server that did not exit cleanly.
+        self.index = ContentIndex.open(doc_path)
+        self.last_refresh = time.monotonic()
+        super().__init__(str(self.socket_path), SearchRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except OSError:
+            pass
+
+    def query(self, command: str, params: Dict[str, Any]) -> Any:
+        """
+        Answer a query from the resident index.
+
+        Args:
+            command: One of the query commands of the command line (keyword, content, ...)
+            params: The keyword arguments of the query
+
+        Returns:
+            The JSON-serializable result of the query
+        """
+        if time.monotonic() - self.last_refresh > SERVER_REFRESH_INTERVAL:
+            if self.index.refresh():
+                self.index.save()
+            self.last_refresh = time.monotonic()
+
+        if command == "ping":
+            return "pong"
+        if command == "keyword":
+            keyword_lower = params["keyword"].lower()
+            return [path for path in self.index.docs if keyword_lower in path.lower()]
+        if command == "content":
+            matches = self.index.search(params["keyword"])
+            if matches is None:
+                matches = find_files_by_content(params["keyword"], self.doc_path, use_index=False)
+            return matches
+        if command == "rank":
+            return self.index.rank(
+                params["query"], params.get("top_k", 10), params.get("by_document", False)
+            )
+        if command == "structure":
+            return list_structure(self.doc_path)
+        if command == "sections":
+            return get_main_sections(self.doc_path)
+        raise ValueError(f"Unknown command: {command}")
+
+
+class SearchRequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single JSON request line sent to the search server."""
+
+    timeout = SERVER_TIMEOUT
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            response = {"result": self.server.query(request["command"], request.get("params", {}))}
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+def serve(doc_path: Union[str, Path, None] = None) -> None:
+    """
+    Run the search server of a documentation directory until interrupted.
+
+    Args:
+        doc_path: Path to documentation directory (defaults to DEFAULT_DOC_PATH)
+    """
+    if doc_path is None:
+        doc_path = Path(DEFAULT_DOC_PATH)
+    else:
+        doc_path = Path(doc_path)
+
+    if not doc_path.exists():
+        print(f"Error: Documentation path not found: {doc_path}")
+        sys.exit(1)
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: The search server requires Unix domain sockets")
+        sys.exit(1)
+
+    def _interrupt(_signum, _frame):
+        raise KeyboardInterrupt
+
+    try:
+        server = SearchServer(doc_path)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, _interrupt)  # Remove the socket when killed, too.
+    with server:
+        print(f"Serving {len(server.index.docs)} file(s) on {server.socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def query_server(
+    command: str, params: Dict[str, Any], doc_path: Union[str, Path, None] = None
+) -> Optional[Any]:
+    """
+    Send a query to the search server of a documentation directory.
+
+    Args:
+        command: The query command (keyword, content, rank, structure or sections)
+        params: The keyword arguments of the query
+        doc_path: Path to documentation directory (defaults to DEFAULT_DOC_PATH)
+
+    Returns:
+        The result of the query, or None if no server is running
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = get_socket_path(doc_path if doc_path is not None else DEFAULT_DOC_PATH)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(SERVER_TIMEOUT)
+            client.connect(str(socket_path))
+            client.sendall(json.dumps({"command": command, "params": params}).encode("utf-8") + b"\n")
+            with client.makefile("rb") as f:
+                response = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    if "error" in response:
+        print(f"Warning: search server error: {response['error']}")
+        return None
+    return response["result"]
+
+
+def run_query(
+    command: str, params: Dict[str, Any], doc_path: Union[str, Path, None] = None
+) -> Any:
+    """
+    Answer a query through the search server if one is running, and in-process otherwise.
+
+    The file lists of keyword and content queries are sorted, so that both paths give the
+    same output.
+
+    Args:
+        command: The query command (keyword, content, rank, structure or sections)
+        params: The keyword arguments of the query
+        doc_path: Path to documentation directory (defaults to DEFAULT_DOC_PATH)
+
+    Returns:
+        The result of the query
+    """
+    result = None
+    if doc_path is None or Path(doc_path).exists():
+        result = query_server(command, params, doc_path)
+
+    if command in ("keyword", "content"):
+        if result is None:
+            finder = find_files_by_keyword if command == "keyword" else find_files_by_content
+            result = finder(params["keyword"], doc_path)
+        return sorted(result)
+    if result is not None:
+        return result
+    if command == "rank":
+        return rank_sections(
+            params["query"], doc_path, params.get("top_k", 10), params.get("by_document", False)
+        )
+    if command == "structure":
+        return list_structure(doc_path)
+    if command == "sections":
+        return get_main_sections(doc_path)
+    raise ValueError(f"Unknown command: {command}")
+
+
 def print_help():
     """Print usage information."""
     print("""
@@ -168,6 +813,10 @@ Usage:
 Commands:
     keyword <keyword>           - Find files by keyword in path/name
     content <keyword>           - Find files by keyword in content
+    rank <query> [-k N] [--documents]
+                                - Rank sections (or files) by relevance to the query (BM25)
+    index [path]                 - Build or update the persistent content index
+    serve [path]                 - Keep the index in memory and answer queries over a socket
     structure [path]             - List documentation structure (optional path)
     sections [path]              - List main documentation sections (optional path)
     help                        - Show this help message
@@ -175,9 +824,13 @@ Commands:
 Examples:
     python search_docs.py keyword installation
     python search_docs.py keyword sales
+    python search_docs.py rank vendor bill payment terms -k 5
     python search_docs.py structure
     python search_docs.py sections
     python search_docs.py structure ../../content
+
+Queries are forwarded to the search server when one is running for the documentation
+directory (see 'serve'), and answered in-process otherwise.
 """)
 
 
@@ -193,7 +846,7 @@ if __name__ == "__main__":
         doc_path_arg = None
         if len(sys.argv) >= 4 and sys.argv[3].endswith("content"):
             doc_path_arg = sys.argv[3]
-        results = find_files_by_keyword(keyword, doc_path_arg)
+        results = run_query("keyword", {"keyword": keyword}, doc_path_arg)
         if results:
             print(f"\nFound {len(results)} file(s) matching '{keyword}':\n")
             for result in results:
@@ -212,7 +865,7 @@ if __name__ == "__main__":
             doc_path_arg = sys.argv[-1]
             keyword = " ".join(sys.argv[2:-1])
 
-        results = find_files_by_content(keyword, doc_path_arg)
+        results = run_query("content", {"keyword": keyword}, doc_path_arg)
         if results:
             print(f"\nFound {len(results)} file(s) containing '{keyword}':\n")
             for result in results:
@@ -220,9 +873,51 @@ if __name__ == "__main__":
         else:
             print(f"\nNo files found containing '{keyword}'")
 
+    elif command == "rank" and len(sys.argv) >= 3:
+        args = sys.argv[2:]
+        top_k = 10
+        by_document = "--documents" in args
+        args = [arg for arg in args if arg != "--documents"]
+        if "-k" in args:
+            k_index = args.index("-k")
+            try:
+                top_k = int(args[k_index + 1])
+            except (IndexError, ValueError):
+                print("Error: -k expects an integer")
+                sys.exit(1)
+            del args[k_index:k_index + 2]
+        doc_path_arg = None
+        if len(args) >= 2 and args[-1].endswith("content"):
+            doc_path_arg = args.pop()
+        query = " ".join(args)
+
+        hits = run_query(
+            "rank", {"query": query, "top_k": top_k, "by_document": by_document}, doc_path_arg
+        )
+        if hits:
+            print(f"\nTop {len(hits)} result(s) for '{query}':\n")
+            for rank, (file, heading, (first_line, last_line), score) in enumerate(hits, 1):
+                print(f"  {rank}. {file}:{first_line}-{last_line}  {heading}  ({score:.2f})")
+        else:
+            print(f"\nNo sections found for '{query}'")
+
+    elif command == "index":
+        doc_path_arg = sys.argv[2] if len(sys.argv) >= 3 else DEFAULT_DOC_PATH
+        if not Path(doc_path_arg).exists():
+            print(f"Error: Documentation path not found: {doc_path_arg}")
+            sys.exit(1)
+        index = ContentIndex.open(doc_path_arg)
+        print(
+            f"\nIndexed {len(index.docs)} file(s) and {len(index.postings)} term(s)"
+            f" in {index.index_path}"
+        )
+
+    elif command == "serve":
+        serve(sys.argv[2] if len(sys.argv) >= 3 else None)
+
     elif command == "structure":
         doc_path_arg = sys.argv[2] if len(sys.argv) >= 3 else None
-        structure = list_structure(doc_path_arg)
+        structure = run_query("structure", {}, doc_path_arg)
         if structure:
             print("\nDocumentation Structure:\n")
             for section, files in structure.items():
@@ -232,7 +927,7 @@ if __name__ == "__main__":
 
     elif command == "sections":
         doc_path_arg = sys.argv[2] if len(sys.argv) >= 3 else None
-        sections = get_main_sections(doc_path_arg)
+        sections = run_query("sections", {}, doc_path_arg)
         if sections:
             print("\nMain Documentation Sections:\n")
             for section in sections:
@@ -0,0 +1,59 @@
+""" Measure the per-document cost of `source_read_replace` on the sources of the documentation.
+
+The single-pass substitution of conf.py is compared with the former implementation, which ran one
+`str.replace` per placeholder over every document.
+
+Usage: python tests/benchmarks/source_read_replace.py [content directory]
+"""
+
+import runpy
+import sys
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+
+def replace_each_key(app, docname, source):
+    """ The former implementation of `source_read_replace`. """
+    result = source[0]
+    for key in app.config.source_read_replace_vals:
+        result = result.replace(f"{{{key}}}", app.config.source_read_replace_vals[key])
+    source[0] = result
+
+
+def benchmark(implementation, app, sources, repeat=5):
+    """ Return the best time, per document and in microseconds, of running an implementation on
+    all the sources.
+    """
+    def run():
+        for docname, text in sources:
+            implementation(app, docname, [text])
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(sources) * 10**6
+
+
+if __name__ == '__main__':
+    content_dir = Path(sys.argv[1] if len(sys.argv) > 1 else 'content')
+    conf = runpy.run_path('conf.py')
+    app = SimpleNamespace(
+        config=SimpleNamespace(source_read_replace_vals=conf['source_read_replace_vals'])
+    )
+    conf['compile_source_read_replace'](app)
+
+    sources = [
+        (str(path.relative_to(content_dir).with_suffix('')), path.read_text())
+        for path in sorted(content_dir.rglob('*.rst'))
+    ]
+    for docname, text in sources:  # Check that both implementations agree before timing them.
+        expected, result = [text], [text]
+        replace_each_key(app, docname, expected)
+        conf['source_read_replace'](app, docname, result)
+        assert expected == result, f"The substitutions differ in {docname}"
+
+    with_placeholders = sum('{' in text for _docname, text in sources)
+    print(f"{len(sources)} documents, {with_placeholders} with curly braces")
+    for name, implementation in (
+        ('one str.replace per key', replace_each_key),
+        ('single-pass regex', conf['source_read_replace']),
+    ):
+        print(f"{name:>24}: {benchmark(implementation, app, sources):.2f} µs/doc")
@@ -1,4 +1,6 @@
 import re
+from collections import namedtuple
+from functools import cached_property, lru_cache
 from pathlib import Path
 
 import sphinxlint
@@ -7,49 +9,97 @@ import sphinxlint
 REDIRECT_RULE_RE = re.compile(r'^[ \t]*([\w\-/]+\.rst)[ \t]+([\w\-/]+\.rst)[ \t]*(?:#.*)?$')
 REDIRECTS_FILE_VERSION_RE = re.compile(r'(?:redirects/)?(?:saas-)?(\d\d\.\d)\.txt')
 
+RedirectRule = namedtuple('RedirectRule', [
+    'lno',  # The 1-based line number of the rule.
+    'old_path',  # The redirected file, or None if the rule is malformed.
+    'new_path',  # The file targeted by the rule, or None if the rule is malformed.
+])
+
+
+def parse_redirect_rules(lines):
+    """ Return the redirect rules of the lines of a redirects file, skipping comments and blank
+    lines.
+    """
+    rules = []
+    for lno, line in enumerate(lines, start=1):
+        if not line.rstrip() or line.startswith('#'):
+            continue
+        match = REDIRECT_RULE_RE.search(line)
+        rules.append(RedirectRule(lno, *(match.groups() if match else (None, None))))
+    return rules
+
 
 @sphinxlint.checker('.txt')
 def check_redirect_rules_format(file, lines, options=None):
     """ Check that redirect rules are correctly formatted. """
     if file.startswith('redirects/'):  # Only check text files in the /redirects folder.
-        for lno, line in enumerate(lines):
-            if not line.rstrip() or line.startswith('#'):
-                continue
-            if not REDIRECT_RULE_RE.search(line):
-                yield lno + 1, "invalid redirect rule format; learn more at redirects/MANUAL.md"
+        for rule in get_redirects_model().get_rules(file, lines):
+            if rule.old_path is None:
+                yield rule.lno, "invalid redirect rule format; learn more at redirects/MANUAL.md"
+
+
+def get_redirects_file_version(file_name):
+    match = REDIRECTS_FILE_VERSION_RE.search(file_name)
+    if match:
+        return float(match.group(1))
+    return -1.0
+
+
+class RedirectsModel:
+    """ The rules of the redirects files and the files that they can target, loaded once per run.
+    """
+
+    def __init__(self, redirects_dir, content_dir):
+        self.content_dir = content_dir
+        redirects_files = [
+            redirects_file for redirects_file in redirects_dir.iterdir()
+            if not redirects_file.is_dir() and redirects_file.suffix == '.txt'
+        ]
+        # The current version is that of the file with the latest version.
+        self.latest_version = max([0.0, *(
+            get_redirects_file_version(redirects_file.name) for redirects_file in redirects_files
+        )])
+        # The redirect rules of each redirects file, by path.
+        self.rules = {
+            redirects_file.as_posix(): parse_redirect_rules(
+                redirects_file.read_text(encoding='utf-8').splitlines(keepends=True)
+            ) for redirects_file in redirects_files
+        }
+
+    def get_rules(self, file, lines):
+        """ Return the redirect rules of a redirects file, parsed from its lines if it is not one
+        of the files loaded with the model.
+        """
+        rules = self.rules.get(Path(file).as_posix())
+        return rules if rules is not None else parse_redirect_rules(lines)
+
+    @cached_property
+    def content_files(self):
+        """ The paths of the RST files, relative to the content directory. """
+        return {
+            rst_file.relative_to(self.content_dir).as_posix()
+            for rst_file in self.content_dir.rglob('*.rst') if rst_file.is_file()
+        }
+
+    def is_content_file(self, path):
+        return Path(path).as_posix() in self.content_files
+
+
+@lru_cache(maxsize=None)
+def get_redirects_model():
+    return RedirectsModel(Path('redirects'), Path('content'))
 
 
 @sphinxlint.checker('.txt')
 def check_redirect_rules_target(file, lines, options=None):
     """ Check that redirect rules refer to existing files. """
-    def get_redirects_file_version(file_name_):
-        match_ = REDIRECTS_FILE_VERSION_RE.search(file_name_)
-        if match_:
-            return float(match_.group(1))
-        return -1.0
-
     if file.startswith('redirects/'):  # Only check text files in the /redirects folder.
-        # Find the current version, which is that of the file with the latest version.
-        redirects_dir = Path('redirects')
-        latest_redirects_version = 0.0
-        for redirect_file in redirects_dir.iterdir():
-            if redirect_file.is_dir() or redirect_file.suffix != '.txt':
-                continue
-            latest_redirects_version = max(
-                latest_redirects_version, get_redirects_file_version(redirect_file.name)
-            )
+        redirects_model = get_redirects_model()
 
         # Only check the existence of the redirection target if we are in the right version.
-        current_file_version = get_redirects_file_version(file)
-        if current_file_version < latest_redirects_version:
+        if get_redirects_file_version(file) < redirects_model.latest_version:
             return
 
-        for lno, line in enumerate(lines):
-            if not line.rstrip() or line.startswith('#'):
-                continue
-            match_res = REDIRECT_RULE_RE.search(line)
-            if match_res:
-                _old_path, new_path = match_res.groups()
-                redirect_file = Path('content') / new_path
-                if not redirect_file.is_file():
-                    yield lno + 1, f"the redirect rule targets the non-existing file {new_path}"
+        for rule in redirects_model.get_rules(file, lines):
+            if rule.new_path is not None and not redirects_model.is_content_file(rule.new_path):
+                yield rule.lno, f"the redirect rule targets the non-existing file {rule.new_path}"
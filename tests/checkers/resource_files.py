@@ -1,3 +1,9 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import struct
+from functools import lru_cache
 from pathlib import Path
 
 from PIL import Image
@@ -9,69 +15,161 @@ MAX_IMAGE_SIZES = {  # in bytes
     '.gif': 2100000,
 }
 MODE_TO_BPP = {
-    '1': 1, 'L': 8, 'P': 8, 'RGB': 24, 'RGBA': 32, 'CMYK': 32, 'YCbCr': 24, 'I': 32, 'F': 32
+    '1': 1, 'L': 8, 'LA': 16, 'P': 8, 'RGB': 24, 'RGBA': 32, 'CMYK': 32, 'YCbCr': 24, 'I': 32,
+    'F': 32,
 }
+FILE_NAME_CHARS = frozenset('_.+-')  # The non-alphanumeric characters of resource file names.
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# The mode in which PIL opens a PNG image, given the bit depth and color type of its IHDR chunk.
+PNG_MODES = {
+    (1, 0): '1', (2, 0): 'L', (4, 0): 'L', (8, 0): 'L', (16, 0): 'I',
+    (8, 2): 'RGB', (16, 2): 'RGB',
+    (1, 3): 'P', (2, 3): 'P', (4, 3): 'P', (8, 3): 'P',
+    (8, 4): 'LA', (16, 4): 'RGBA',
+    (8, 6): 'RGBA', (16, 6): 'RGBA',
+}
+REPO_DIR = Path(__file__).parents[2]
+# The results of the image checks, keyed by path relative to the repository and valid as long as
+# the size and mtime of the image and the code of the checks do not change.
+IMAGE_CHECKS_CACHE = REPO_DIR / '.odoo-docs-cache' / 'image_checks.json'
+IMAGE_CHECKS_VERSION = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
 
 
-def log_error(file, line, msg, checker_name):
-    """ Log an error in sphinx-lint's log format to ease the processing of linting errors on Runbot.
-    """
-    print(f"{file}:{line or 0}: {msg} ({checker_name})")
-
-
-def check_image_size(file):
+def check_image_size(file, file_size=None):
     """ Check that images are not larger than the maximum file size allowed for their extension. """
     file_path = Path(file)
-    file_size = file_path.stat().st_size
+    if file_size is None:
+        file_size = file_path.stat().st_size
     max_size = MAX_IMAGE_SIZES.get(file_path.suffix)
     if max_size and file_size > max_size:
-        log_error(
-            file_path,
+        yield (
+            file,
             0,
             f"the file has a size of {round(file_size / 10**6, 2)} MB, larger than the maximum"
             f" allowed size of {round(max_size / 10**6, 2)} MB; compress it with pngquant",
             'image-size',
         )
 
+def read_png_mode(file):
+    """ Return the mode of a PNG image from its IHDR chunk, without decoding the image.
+
+    The mode only depends on the bit depth and color type of the image, so only the first 33 bytes
+    of the file are read. Files that are not regular PNG images are opened with PIL.
+    """
+    with open(file, 'rb') as f:
+        header = f.read(33)  # Signature (8), IHDR length and type (8), IHDR data (13) and CRC (4).
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b'IHDR' and len(header) == 33:
+        bit_depth, color_type = struct.unpack('>BB', header[24:26])
+        if (bit_depth, color_type) in PNG_MODES:
+            return PNG_MODES[bit_depth, color_type]
+    with Image.open(file) as image:
+        return image.mode
+
 def check_image_color_depth(file):
     """ Check that PNG images are compressed to 8-bit color depth with PNGQuant. """
     file_path = Path(file)
     if file_path.suffix.lower() == '.png':
-        data = Image.open(file)
-        bpp = MODE_TO_BPP[data.mode]
+        bpp = MODE_TO_BPP[read_png_mode(file)]
         if bpp > 8:
-            log_error(
-                file_path,
+            yield (
+                file,
                 0,
                 f"the file has a color depth of {bpp} instead of 8; compress it with pngquant",
                 'image-color-depth'
             )
 
+def check_image(file, file_size):
+    """ Run the image checks on a file and return their errors. """
+    return [*check_image_size(file, file_size), *check_image_color_depth(file)]
+
+def check_images(files):
+    """ Run the image checks on files in parallel and return their errors, keyed by file.
+
+    The results are cached in IMAGE_CHECKS_CACHE, so that unchanged images are not opened again.
+    """
+    try:
+        cache = json.loads(IMAGE_CHECKS_CACHE.read_text())
+        entries = cache['entries'] if cache.get('version') == IMAGE_CHECKS_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        entries = {}
+
+    results, stale_files = {}, []
+    for file in files:
+        stat = os.stat(file)
+        entry = entries.get(os.path.relpath(file, REPO_DIR))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            results[file] = [(file, *error[1:]) for error in entry[2]]
+        else:
+            stale_files.append((file, stat))
+
+    if len(stale_files) < 8:
+        checked = [check_image(file, stat.st_size) for file, stat in stale_files]
+    else:
+        with multiprocessing.Pool() as pool:
+            checked = pool.starmap(
+                check_image, [(file, stat.st_size) for file, stat in stale_files], chunksize=32
+            )
+    for (file, stat), errors in zip(stale_files, checked):
+        results[file] = errors
+        entries[os.path.relpath(file, REPO_DIR)] = [stat.st_size, stat.st_mtime_ns, errors]
+
+    if stale_files:
+        entries = {
+            path: entry for path, entry in entries.items() if os.path.exists(REPO_DIR / path)
+        }
+        try:
+            IMAGE_CHECKS_CACHE.parent.mkdir(exist_ok=True)
+            IMAGE_CHECKS_CACHE.write_text(
+                json.dumps({'version': IMAGE_CHECKS_VERSION, 'entries': entries})
+            )
+        except OSError:
+            pass  # The cache is an optimization only.
+    return results
+
 def check_resource_file_name(file_path):
     """ Check that resource file names use hyphens rather than underscores. """
     if '_' in file_path.split('/')[-1]:
-        log_error(
+        yield (
             file_path,
             0,
             "the resource file should have hyphens rather than underscores",
             'resource-file-name'
         )
 
+def is_file_name_in(name, text):
+    """ Return whether a file name appears in a text, other than as the end of a longer name. """
+    start = text.find(name)
+    while start != -1:
+        if start == 0 or not (text[start - 1].isalnum() or text[start - 1] in FILE_NAME_CHARS):
+            return True
+        start = text.find(name, start + 1)
+    return False
+
+@lru_cache(maxsize=None)
+def get_referenced_file_names(resource_folder):
+    """ Return the names of the files of a resource folder that are referenced in its RST file.
+
+    The RST file is read once per run, however many resource files the folder holds; the files
+    that are not referenced are the difference between the folder's content and this set.
+    """
+    text = resource_folder.with_suffix('.rst').read_text()
+    return frozenset(name for name in os.listdir(resource_folder) if is_file_name_in(name, text))
+
 def check_resource_file_referenced(file, options=None):
     """ Check that resource files are referenced in at least one RST file. """
     resource_file = Path(file)
     resource_folder = resource_file.parent
     rst_file = resource_folder.with_suffix('.rst')
     if rst_file.exists():
-        if resource_file.name not in rst_file.read_text():
-            log_error(
+        if resource_file.name not in get_referenced_file_names(resource_folder):
+            yield (
                 file,
                 0,
                 f"the resource file is not referenced in {rst_file}",
                 "resource-file-referenced",
             )
     else:
-        log_error(
+        yield (
             rst_file,
             0,
             f"resource folder name '{resource_folder.name}' does not match an rst file name.",
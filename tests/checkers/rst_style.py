@@ -1,11 +1,11 @@
 import re
+from collections import namedtuple
 
 import sphinxlint
 
 
 ALLOWED_HEADING_CHARS = ['=', '-', '~', '*', '^']  # In the same order as in the guidelines.
 MAIN_HEADING_CHAR = ALLOWED_HEADING_CHARS[0]
-MAIN_HEADING_RE = re.compile(rf'{MAIN_HEADING_CHAR}+\n[^\n]+\n{MAIN_HEADING_CHAR}+\n')
 HEADING_DELIMITER_RE = re.compile(
     '^(' + '|'.join(rf'\{char}+' for char in ALLOWED_HEADING_CHARS) + ')\n$'
 )
@@ -19,91 +19,150 @@ GIT_CONFLICT_MARKERS = ['<' * 7, '>' * 7]
 ALLOWED_EARLY_BREAK_RE = re.compile(r'^\s*(\.\. |:\S+:\s+)', re.IGNORECASE)  # Contains markup.
 
 
+HeadingDelimiter = namedtuple('HeadingDelimiter', [
+    'lno',  # The index of the delimiter line.
+    'char',  # The character of the delimiter.
+    'level',  # The index of the character in ALLOWED_HEADING_CHARS.
+    'length',  # The length of the delimiter.
+    'heading_lno',  # The index of the heading text, or -1 if there is none.
+    'overline',  # Whether the delimiter is the upper delimiter of a main heading (h1).
+    'main',  # Whether the delimiter is the lower delimiter of a main heading (h1).
+    'blank_before',  # Whether the previous line is blank.
+    'blank_after',  # Whether the next line is blank, or the delimiter is the last line.
+])
+
+
+class HeadingModel:
+    """ The heading delimiters of a file, found in a single pass over its lines. """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.delimiters = []  # The HeadingDelimiter of each line made of an allowed character.
+        self.forbidden_delimiter_lnos = []  # The lines made of a forbidden character.
+        self.main_headings_count = 0
+
+        delimiters = []
+        for lno, line in enumerate(lines):
+            first_char = line[:1]  # Only run the regexes on lines that may be delimiters.
+            if first_char in ALLOWED_HEADING_CHARS:
+                if HEADING_DELIMITER_RE.search(line):
+                    delimiters.append(lno)
+            elif first_char in FORBIDDEN_HEADING_CHARS:
+                if FORBIDDEN_HEADING_DELIMITER_RE.search(line):
+                    self.forbidden_delimiter_lnos.append(lno)
+
+        # The lower delimiters of main headings: lines of MAIN_HEADING_CHAR under a non-blank title,
+        # itself under a line ending with MAIN_HEADING_CHAR.
+        main_lnos = {
+            lno for lno in delimiters
+            if lno >= 2 and lines[lno][0] == MAIN_HEADING_CHAR
+            and lines[lno - 1] != '\n' and lines[lno - 2].endswith(f'{MAIN_HEADING_CHAR}\n')
+        }
+        last_main_lno = -1
+        for lno in sorted(main_lnos):  # Count the headings that do not share a delimiter line.
+            if lno - 2 > last_main_lno:
+                self.main_headings_count += 1
+                last_main_lno = lno
+
+        for lno in delimiters:
+            overline = lno + 2 in main_lnos and lines[lno][0] == MAIN_HEADING_CHAR
+            heading_lno = lno + 1 if overline else lno - 1
+            self.delimiters.append(HeadingDelimiter(
+                lno=lno,
+                char=lines[lno][0],
+                level=ALLOWED_HEADING_CHARS.index(lines[lno][0]),
+                length=len(lines[lno].rstrip()),
+                heading_lno=heading_lno,
+                overline=overline,
+                main=lno in main_lnos,
+                blank_before=lno >= 1 and lines[lno - 1] == '\n',
+                blank_after=lno + 1 == len(lines) or lines[lno + 1] == '\n',
+            ))
+
+
+# The (file, id(lines)) key and the HeadingModel of the last lines checked.
+_heading_model = (None, None)
+
+
+def get_heading_model(file, lines):
+    """ Return the heading model of the lines of a file.
+
+    The model is computed once per file: sphinx-lint runs the checkers of a file one after the
+    other on the same list of lines, so the model of the last lines is kept. The model holds a
+    reference to its lines, so that their id is not reused by the lines of another file.
+    """
+    global _heading_model
+    key = (file, id(lines))
+    if _heading_model[0] != key:
+        _heading_model = (key, HeadingModel(lines))
+    return _heading_model[1]
+
+
 @sphinxlint.checker('.rst')
 def check_heading_delimiters_characters(file, lines, options=None):
     """ Check that heading delimiters use only allowed characters. """
-    for lno, line in enumerate(lines):
-        if FORBIDDEN_HEADING_DELIMITER_RE.search(line):
-            yield lno + 1, f"illegal use of the character {line[0]} in heading delimiters; use" \
-                           f" any of {', '.join(ALLOWED_HEADING_CHARS)} instead"
+    for lno in get_heading_model(file, lines).forbidden_delimiter_lnos:
+        yield lno + 1, f"illegal use of the character {lines[lno][0]} in heading delimiters; use" \
+                       f" any of {', '.join(ALLOWED_HEADING_CHARS)} instead"
 
 
 @sphinxlint.checker('.rst')
 def check_heading_delimiters_order(file, lines, options=None):
     """ Check that heading delimiters appear in the correct order. """
     last_delimiter_char_index = -1  # The index of the heading delimiter char in the ordered list.
-    for lno, line in enumerate(lines):
-        if HEADING_DELIMITER_RE.search(line):  # The line is a heading delimiter.
-            delimiter_char = line[0]
-            delimiter_char_index = ALLOWED_HEADING_CHARS.index(delimiter_char)
-            if delimiter_char_index > last_delimiter_char_index + 1:
-                # There is a leap of more than 1 in the chars used for the heading delimiters.
-                last_delimiter_char = ALLOWED_HEADING_CHARS[last_delimiter_char_index] \
-                    if last_delimiter_char_index != -1 else None
-                yield lno + 1, f"the heading delimiter {delimiter_char} is not allowed after a" \
-                               f" heading with {last_delimiter_char} as delimiter; follow this" \
-                               f" order: {', '.join(ALLOWED_HEADING_CHARS)}"
-            last_delimiter_char_index = delimiter_char_index
+    for delimiter in get_heading_model(file, lines).delimiters:
+        if delimiter.level > last_delimiter_char_index + 1:
+            # There is a leap of more than 1 in the chars used for the heading delimiters.
+            last_delimiter_char = ALLOWED_HEADING_CHARS[last_delimiter_char_index] \
+                if last_delimiter_char_index != -1 else None
+            yield delimiter.lno + 1, f"the heading delimiter {delimiter.char} is not allowed" \
+                                     f" after a heading with {last_delimiter_char} as delimiter;" \
+                                     f" follow this order: {', '.join(ALLOWED_HEADING_CHARS)}"
+        last_delimiter_char_index = delimiter.level
 
 
 @sphinxlint.checker('.rst')
 def check_max_one_main_heading(file, lines, options=None):
     """ Check that there is at most one main heading (h1) per document. """
-    code = "".join(lines)
-    nb_main_headings = len(MAIN_HEADING_RE.findall(code))
-    if nb_main_headings > 1:
+    if get_heading_model(file, lines).main_headings_count > 1:
         yield 0, "the document should have only one main heading"
 
 
 @sphinxlint.checker('.rst')
 def check_min_one_main_heading(file, lines, options=None):
     """ Check that there is a main heading (h1) on document when it contains other headings. """
-    heading_found, main_heading_found = False, False
-    for lno, line in enumerate(lines):
-        if HEADING_DELIMITER_RE.search(line):  # The line is a heading delimiter.
-            heading_found = True
-            if MAIN_HEADING_RE.search(''.join(lines[lno - 2:lno + 1])):  # Lower delimiter of h1.
-                main_heading_found = True
-                break
-
-    if heading_found and not main_heading_found:
+    delimiters = get_heading_model(file, lines).delimiters
+    if delimiters and not any(delimiter.main for delimiter in delimiters):
         yield 0, "the document should have a main heading (h1)"
 
 
 @sphinxlint.checker('.rst')
 def check_heading_delimiters_length(file, lines, options=None):
     """ Check that heading delimiters have the same length as their heading. """
-    for lno, line in enumerate(lines):
-        previous_line = lno >= 1 and lines[lno - 1]
-        if HEADING_DELIMITER_RE.search(line) and previous_line != '\n':  # Heading delimiter found.
-            if MAIN_HEADING_RE.search(''.join(lines[lno:lno+3])):  # Upper delimiter of h1.
-                heading_lno = lno + 1
-            else:  # Lower delimiter of a heading of any level.
-                heading_lno = lno - 1
-            if len(line.rstrip()) != len(lines[heading_lno].rstrip()):
-                yield lno + 1, "the heading delimiter should have the same length as its heading"
+    for delimiter in get_heading_model(file, lines).delimiters:
+        if delimiter.blank_before or delimiter.heading_lno == -1:  # Not a heading delimiter.
+            continue
+        if delimiter.length != len(lines[delimiter.heading_lno].rstrip()):
+            yield delimiter.lno + 1, "the heading delimiter should have the same length as its" \
+                                     " heading"
 
 
 @sphinxlint.checker('.rst')
 def check_heading_spacing(file, lines, options=None):
     """ Check that headings are preceded and followed by at least one blank line. """
-    for lno, line in enumerate(lines):
-        previous_line = lno > 1 and lines[lno - 1]
-        if HEADING_DELIMITER_RE.search(line) and previous_line != '\n':  # Heading delimiter found.
-            if MAIN_HEADING_RE.search(''.join(lines[lno:lno+3])):  # Upper delimiter of h1.
-                continue  # We handle this heading via its lower delimiter.
-
-            heading_lno = lno - 1
-            if MAIN_HEADING_RE.search(''.join(lines[lno-2:lno+1])):  # Lower delimiter of h1.
-                main_heading = True
-            else:  # Lower delimiter of a heading of level 2-6.
-                main_heading = False
-            lno_before_heading = heading_lno - (2 if main_heading else 1)
-            if lno_before_heading >= 0 and lines[lno_before_heading] != '\n':
-                # Heading doesn't have to be preceded by a blank line if on first line of the file.
-                yield heading_lno + 1, "the heading should be preceded by a blank line"
-            if lines[heading_lno + 2] != '\n':
-                yield heading_lno + 1, "the heading should be followed by a blank line"
+    for delimiter in get_heading_model(file, lines).delimiters:
+        if delimiter.blank_before or delimiter.heading_lno == -1:  # Not a heading delimiter.
+            continue
+        if delimiter.overline:
+            continue  # We handle this heading via its lower delimiter.
+
+        heading_lno = delimiter.heading_lno
+        lno_before_heading = heading_lno - (2 if delimiter.main else 1)
+        if lno_before_heading >= 0 and lines[lno_before_heading] != '\n':
+            # Heading doesn't have to be preceded by a blank line if on first line of the file.
+            yield heading_lno + 1, "the heading should be preceded by a blank line"
+        if not delimiter.blank_after:
+            yield heading_lno + 1, "the heading should be followed by a blank line"
 
 
 @sphinxlint.checker('.rst', enabled=False)
@@ -0,0 +1,121 @@
+""" Output the errors of `make test` in sphinx-lint's log format, or as structured diagnostics for CI
+tools that would otherwise parse the log.
+
+The diagnostics are either NDJSON (one JSON object per line) or a SARIF 2.1.0 log, whose results
+can only be read once the log is complete. Output is buffered and written in chunks, so that large
+runs do not pay for one write per diagnostic.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Output formats of the --format option; 'text' is sphinx-lint's log format.
+FORMATS = ('text', 'ndjson', 'sarif')
+# Number of characters buffered before they are written to the output stream.
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+
+class DiagnosticsEmitter:
+    """ Emit each error as a "file:line: message (checker)" line, as sphinx-lint does, to ease the
+    processing of linting errors on Runbot. Subclasses emit the errors as structured diagnostics.
+    """
+
+    def __init__(self, tool, stream=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.tool = tool
+        self.stream = stream or sys.stdout
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.buffered = 0
+        self.count = 0
+        self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        pass
+
+    def emit(self, file, line, checker_name, msg):
+        """ Emit an error on a 1-based line of a file, or on the whole file if line is 0. """
+        self.count += 1
+        self.write(self.format(Path(file).as_posix(), line or 0, checker_name, msg))
+
+    def format(self, file, line, checker_name, msg):
+        return f'{file}:{line}: {msg} ({checker_name})\n'
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.chunks:
+            self.stream.write(''.join(self.chunks))
+            self.chunks, self.buffered = [], 0
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+
+class NdjsonEmitter(DiagnosticsEmitter):
+    """ Emit each error as a JSON object on its own line. """
+
+    def format(self, file, line, checker_name, msg):
+        return json.dumps({
+            'tool': self.tool,
+            'file': file,
+            'line': line,
+            'rule': checker_name,
+            'level': 'error',
+            'message': msg,
+        }, ensure_ascii=False) + '\n'
+
+
+class SarifEmitter(DiagnosticsEmitter):
+    """ Emit the errors as the results of a single-run SARIF log.
+
+    The results are written as they come; the tool description, which lists the checkers that
+    reported errors, is written after them when the emitter is closed.
+    """
+
+    def start(self):
+        self.rules = {}
+        self.write(
+            f'{{"$schema": "{SARIF_SCHEMA}", "version": "2.1.0", "runs": [{{"results": [\n'
+        )
+
+    def format(self, file, line, checker_name, msg):
+        self.rules.setdefault(checker_name, len(self.rules))
+        location = {'artifactLocation': {'uri': file}}
+        if line:
+            location['region'] = {'startLine': line}
+        result = {
+            'ruleId': checker_name,
+            'ruleIndex': self.rules[checker_name],
+            'level': 'error',
+            'message': {'text': msg},
+            'locations': [{'physicalLocation': location}],
+        }
+        separator = ',\n' if self.count > 1 else ''
+        return separator + json.dumps(result, ensure_ascii=False)
+
+    def close(self):
+        driver = {'name': self.tool, 'rules': [{'id': rule} for rule in self.rules]}
+        self.write(f'\n], "tool": {{"driver": {json.dumps(driver)}}}}}]}}\n')
+        super().close()
+
+
+def open_emitter(output_format, tool, stream=None):
+    """ Return the emitter of an output format. """
+    emitter_class = {'ndjson': NdjsonEmitter, 'sarif': SarifEmitter}.get(
+        output_format, DiagnosticsEmitter
+    )
+    return emitter_class(tool, stream)
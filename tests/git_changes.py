@@ -0,0 +1,42 @@
+""" Read the files changed since a git revision, for the `--changed-since` option of `make test`.
+"""
+
+import subprocess
+from pathlib import Path
+
+
+class GitError(Exception):
+    pass
+
+
+def git(*args, cwd=None):
+    """ Run a git command and return its standard output. """
+    try:
+        result = subprocess.run(
+            ['git', *args], cwd=cwd, capture_output=True, text=True, check=True
+        )
+    except FileNotFoundError:
+        raise GitError("git is not installed")
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.strip() or f"git {' '.join(args)} failed")
+    return result.stdout
+
+
+def get_changed_paths(rev):
+    """ Return the root of the repository and the absolute paths of the files changed since `rev`:
+    committed, staged, unstaged, deleted and untracked files alike.
+
+    Renames are reported as the deletion of the old path and the addition of the new one.
+    """
+    toplevel = Path(git('rev-parse', '--show-toplevel').strip())
+    names = git('diff', '--name-only', '--no-renames', '-z', rev, '--', cwd=toplevel).split('\0')
+    names += git('ls-files', '--others', '--exclude-standard', '-z', cwd=toplevel).split('\0')
+    return toplevel, {toplevel / name for name in names if name}
+
+
+def get_content_at(rev, path, toplevel):
+    """ Return the content of a file at `rev`, or None if it did not exist. """
+    try:
+        return git('show', f'{rev}:{Path(path).relative_to(toplevel).as_posix()}', cwd=toplevel)
+    except (GitError, UnicodeDecodeError):
+        return None
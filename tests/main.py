@@ -1,13 +1,20 @@
 import argparse
+import contextlib
+import io
+import multiprocessing
 import os
 import re
 import sys
+from functools import partial, wraps
 from itertools import chain
+from pathlib import Path
 from unittest.mock import patch
 
 import sphinxlint
 
 import checkers
+import diagnostics
+import git_changes
 
 
 CUSTOM_RST_DIRECTIVES = [
@@ -17,20 +24,173 @@ CUSTOM_RST_DIRECTIVES = [
     'tab', 'tabs', 'group-tab', 'code-tab',  # sphinx_tabs
 ]
 
+CONTENT_DIR = 'content'
+REDIRECTS_DIR = 'redirects'
+TARGET_RE = re.compile(r'^[ \t]*\.\. _`?([^:`\n]+?)`?[ \t]*:', re.MULTILINE)
+LINK_RE = re.compile(r':(ref|doc):`(?:[^<`]*<)?([^>`\s]+)>?`')
+IMAGE_RE = re.compile(r'^\s*\.\. (?:image|figure):: (\S+)', re.MULTILINE)
+
+# The image checks (size and color depth) are run in parallel by `check_images`, and cached.
 ADDITIONAL_CHECKERS = [
-    checkers.resource_files.check_image_size,
-    checkers.resource_files.check_image_color_depth,
     checkers.resource_files.check_resource_file_name,
     checkers.resource_files.check_resource_file_referenced,
 ]
 
 
-def run_additional_checks(argv=None):
+def run_additional_checks(argv, emitter):
+    """ Run the checkers of the resource files and emit their errors with `emitter`. """
     _enabled_checkers, args = sphinxlint.parse_args(argv)
-    for path in chain.from_iterable(sphinxlint.walk(path, args.ignore) for path in args.paths):
-        if 'content/' in path and not path.endswith('.rst'):  # Leave root and locale files alone.
-            for checker in ADDITIONAL_CHECKERS:
-                checker(path)
+    paths = [
+        path for path in chain.from_iterable(
+            sphinxlint.walk(path, args.ignore) for path in args.paths
+        ) if 'content/' in path and not path.endswith('.rst')  # Leave root and locale files alone.
+    ]
+    image_errors = checkers.resource_files.check_images(paths)
+    for path in paths:
+        errors = chain(image_errors[path], *(checker(path) for checker in ADDITIONAL_CHECKERS))
+        for file, line, msg, checker_name in errors:
+            emitter.emit(file, line, checker_name, msg)
+
+
+def collect_errors(checker, errors):
+    """ Return a checker yielding no errors to sphinx-lint, but collecting those of `checker` as
+    (file, line, message, checker name) tuples in `errors`.
+    """
+    @wraps(checker)  # Keep the name, suffixes and rst_only attributes of the checker.
+    def collecting_checker(file, lines, options=None):
+        errors.extend((file, lno, msg, checker.name) for lno, msg in checker(file, lines, options))
+        return ()
+    return collecting_checker
+
+
+def lint_file(path, enabled_checkers, options):
+    """ Run sphinx-lint's checkers on a file with `sphinxlint.check_file`, but return the errors
+    as (file, line, message, checker name) tuples instead of printing them.
+    """
+    errors = []
+    with contextlib.redirect_stdout(io.StringIO()) as output:  # Only the read errors are printed.
+        sphinxlint.check_file(
+            path, [collect_errors(checker, errors) for checker in enabled_checkers], options
+        )
+    errors += [
+        (path, 0, line.removeprefix(f'{path}: '), 'read-error')
+        for line in output.getvalue().splitlines()
+    ]
+    return errors
+
+
+def run_checks(argv, emitter):
+    """ Run sphinx-lint's checkers in parallel like `sphinxlint.main` does, but emit their errors
+    with `emitter`, file by file, so that they can be output as structured diagnostics.
+    """
+    enabled_checkers, args = sphinxlint.parse_args(argv)
+    options = sphinxlint.CheckersOptions.from_argparse(args)
+    paths = chain.from_iterable(sphinxlint.walk(path, args.ignore) for path in args.paths)
+    errors_count = 0
+    with multiprocessing.Pool() as pool:
+        for errors in pool.imap(
+            partial(lint_file, enabled_checkers=enabled_checkers, options=options),
+            paths,
+            chunksize=16,
+        ):
+            for file, line, msg, checker_name in errors:
+                emitter.emit(file, line, checker_name, msg)
+            errors_count += len(errors)
+    return int(bool(errors_count))
+
+
+def pop_output_format(argv):
+    """ Return the command line without the `--format` option, and the requested output format.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--format', choices=diagnostics.FORMATS, default='text')
+    args, argv = parser.parse_known_args(argv)
+    return argv, args.format
+
+
+def resolve_content_path(target, rst_dir, content_dir):
+    """ Return the absolute path of the target of a link or an image of an RST file, as Sphinx
+    resolves it: relative to the content directory if it starts with a slash, to the directory of
+    the RST file otherwise.
+    """
+    path = content_dir / target[1:] if target.startswith('/') else rst_dir / target
+    return Path(os.path.normpath(path))
+
+
+def get_changed_files(rev, paths):
+    """ Return the files to lint after the changes made since the git revision `rev`.
+
+    These are the changed (added, modified or untracked) files themselves, the resource files of
+    changed RST files, the RST files that link to a changed RST file or use a changed image and,
+    if an RST file was removed, the redirect rules. Only files inside `paths` are returned.
+    """
+    toplevel, changed_paths = git_changes.get_changed_paths(rev)
+    content_dir = toplevel / CONTENT_DIR
+
+    selected = {path for path in changed_paths if path.is_file()}
+    changed_docs, changed_targets, changed_resources = set(), set(), set()
+    for path in changed_paths:
+        if content_dir not in path.parents:
+            continue
+        if path.suffix != '.rst':
+            changed_resources.add(path)
+            continue
+        changed_docs.add(path.with_suffix(''))
+        resource_folder = path.with_suffix('')
+        if resource_folder.is_dir():  # Resource files may no longer be referenced.
+            selected.update(p for p in resource_folder.iterdir() if p.is_file())
+        new_targets, old_targets = set(), set()
+        if path.is_file():
+            new_targets.update(TARGET_RE.findall(path.read_text(encoding='utf-8')))
+        else:  # Removed: redirect rules may now target a missing file.
+            selected.update((toplevel / REDIRECTS_DIR).glob('*.txt'))
+        old_content = git_changes.get_content_at(rev, path, toplevel)
+        if old_content:  # Not added since `rev`.
+            old_targets.update(TARGET_RE.findall(old_content))
+        changed_targets.update(new_targets ^ old_targets)
+
+    if changed_docs or changed_resources:
+        for rst_file in content_dir.rglob('*.rst'):
+            content = rst_file.read_text(encoding='utf-8')
+            for role, target in LINK_RE.findall(content):
+                if role == 'ref':
+                    if target in changed_targets:
+                        break
+                elif resolve_content_path(target, rst_file.parent, content_dir) in changed_docs:
+                    break
+            else:
+                if not any(
+                    resolve_content_path(image, rst_file.parent, content_dir) in changed_resources
+                    for image in IMAGE_RE.findall(content)
+                ):
+                    continue
+            selected.add(rst_file)
+
+    selected_paths = (os.path.relpath(path) for path in selected)
+    return sorted(
+        path for path in selected_paths
+        if any(path == root or path.startswith(root.rstrip('/') + '/') for root in paths)
+    )
+
+
+def restrict_to_changed_files(argv):
+    """ Replace the paths of the command line by the files changed since `--changed-since`. """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--changed-since', metavar='REV')
+    args, argv = parser.parse_known_args(argv)
+    if not args.changed_since:
+        return argv
+    _enabled_checkers, sphinxlint_args = sphinxlint.parse_args(argv)
+    paths = [os.path.normpath(path) for path in sphinxlint_args.paths]
+    options = [arg for arg in argv[1:] if os.path.normpath(arg) not in paths]
+    try:
+        changed_files = get_changed_files(args.changed_since, paths)
+    except git_changes.GitError as e:
+        sys.exit(f"Error: {e}")
+    if not changed_files:
+        print(f"No files to check: nothing changed since {args.changed_since}.")
+        sys.exit(0)
+    return [argv[0], *options, *changed_files]
 
 
 """
@@ -88,5 +248,13 @@ if __name__ == '__main__':
         if os.getenv('REVIEW') == '1':  # Enable checkers for `make review`.
             setattr(sphinxlint.check_line_too_long, 'enabled', True)
             setattr(checkers.rst_style.check_early_line_breaks, 'enabled', True)
-        run_additional_checks()
-        sys.exit(sphinxlint.main())
+        argv, output_format = pop_output_format(sys.argv)
+        argv = restrict_to_changed_files(argv)
+        with diagnostics.open_emitter(output_format, 'odoo-docs-tests') as emitter:
+            run_additional_checks(argv, emitter)
+            if output_format == 'text':  # Keep sphinx-lint's own log, e.g., for `--list`.
+                emitter.flush()
+                status = sphinxlint.main(argv)
+            else:
+                status = run_checks(argv, emitter)
+        sys.exit(status)
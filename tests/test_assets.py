@@ -0,0 +1,52 @@
+""" Test the bundling of the scripts of the theme.
+
+Usage: python -m unittest tests/test_assets.py
+"""
+
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'extensions'))
+from odoo_theme import assets  # noqa: E402
+
+
+class TestBundleScripts(unittest.TestCase):
+
+    def bundle(self, *scripts):
+        """ Return the bundle of scripts given by their content. """
+        with tempfile.TemporaryDirectory() as static_dir:
+            Path(static_dir, 'js').mkdir()
+            names = []
+            for index, script in enumerate(scripts):
+                names.append(f'script{index}.js')
+                Path(static_dir, 'js', names[-1]).write_text(script, encoding='utf-8')
+            with patch.object(assets, 'STATIC_DIR', Path(static_dir)), \
+                    patch.object(assets, 'SCRIPTS', names):
+                return assets.bundle_scripts().decode()
+
+    def test_comment_with_backtick(self):
+        """ An unbalanced backtick in a comment must not change the code that follows it. """
+        first_script = (
+            "init(); // don't use `foo\n"
+            'const html = `\n    <div>\n        indented\n    </div>\n`;\n'
+        )
+        second_script = 'render(html);\n'
+        bundle = self.bundle(first_script, second_script)
+        self.assertEqual(bundle, f'{first_script}\n;\n{second_script}')
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_bundle_syntax(self):
+        """ The bundle of the scripts of the theme must be valid JavaScript. """
+        with tempfile.NamedTemporaryFile(suffix='.js') as bundle_file:
+            bundle_file.write(assets.bundle_scripts())
+            bundle_file.flush()
+            subprocess.run(['node', '--check', bundle_file.name], check=True)
+
+
+if __name__ == '__main__':
+    unittest.main()